@@ -1,8 +1,14 @@
 import web
 from pycryptics.solve_clue import CrypticClueSolver, split_clue_text
+from pycryptics.crypticweb.result_cache import ResultCache, MemcacheBackend
+from google.appengine.api import memcache
 import re
 
 SERVER = "http://cryptic-solver.appspot.com/solve/"
+# Seconds for which solved clues are kept in memcache
+RESULT_CACHE_TTL = 24 * 60 * 60
+# Distinct answers ranked and shown for each clue
+DISPLAYED_ANSWERS = 200
 
 class index:
     def GET(self):
@@ -27,11 +33,12 @@ class solve:
                 return render.solver(None, clue, "Something went wrong that I don't know how to handle. Here's python's attempt at an explanation:<br>" + str(e))
             if len(phrases) > 7:
                 return render.solver(None, clue, "Sorry, I can't reliably handle clues longer than 7 phrases yet. Try grouping some words into phrases by putting an underscore instead of a space between them")
-            solver.setup(clue)
-            solver.run()
-            answers = solver.collect_answers()
+            answers = result_cache.get(clue)
+            if answers is None:
+                answers = solver.solve(clue, DISPLAYED_ANSWERS)
+                result_cache.put(clue, answers)
             print "returning:", answers
-            return render.solver(answers, solver.clue_text, "")
+            return render.solver(answers, clue.encode('ascii', 'ignore'), "")
         else:
             return render.solver(None, "", "")
 
@@ -42,6 +49,7 @@ urls = ('/', 'index',
 
 
 solver = CrypticClueSolver()
+result_cache = ResultCache(MemcacheBackend(memcache), RESULT_CACHE_TTL)
 
 app = web.application(urls, globals())
 print "Starting up server. Press Ctrl+c to shut down"
@@ -0,0 +1,206 @@
+"""
+Benchmark the solver on the clue corpora, and check for regressions
+against a stored baseline.
+
+    python pycryptics/benchmark.py --save-baseline bench_baseline.json
+    python pycryptics/benchmark.py --baseline bench_baseline.json
+
+Each clue is solved with instrumentation on (see utils/instrumentation.py),
+and for each corpus the report gives latency percentiles and the total
+parses and candidate answers, along with the process's peak RSS, the
+time taken to load each data set and the time per call of a few of the
+solver's components. Compared against a
+baseline, the exit status is 1 if any latency, micro-benchmark or peak
+RSS grew by more than its threshold, or any count changed by more than
+its threshold.
+"""
+from __future__ import division
+from pycryptics.solve_clue import CrypticClueSolver, Constraints, split_clue_text
+from pycryptics.utils.clue_funcs import anagrams, all_insertions, bigram_filter
+from pycryptics.utils.phrasings import phrasings
+from pycryptics.grammar.clue_parse import generate_clues
+from pycryptics.utils.data_files import load_timings
+import argparse
+import json
+import math
+import resource
+import sys
+import time
+
+CORPORA = ['clues/known_clues.txt', 'clues/more_known_clues.txt', 'clues/failed_clues.txt']
+PERCENTILES = [50, 90, 99]
+
+# Allowed growth, as a fraction of the baseline
+TIME_THRESHOLD = 0.25
+RSS_THRESHOLD = 0.1
+# Allowed change in parse and candidate counts, as a fraction of the baseline
+COUNT_THRESHOLD = 0.0
+
+
+def read_corpus(fname):
+    with open(fname, 'r') as f:
+        return [line.decode('utf-8').strip() for line in f.readlines()
+                if line.strip() != '' and not line.startswith('//')]
+
+
+def percentile(values, p):
+    """
+    The p'th percentile of values, by the nearest-rank method.
+    """
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[max(0, int(math.ceil(p * len(values) / 100)) - 1)]
+
+
+def peak_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def bench_corpus(solver, fname):
+    clues = []
+    for clue_text in read_corpus(fname):
+        known_answer = split_clue_text(clue_text)[3].strip().lower()
+        solver.setup(clue_text)
+        start = time.time()
+        answers = solver.run()
+        seconds = time.time() - start
+        report = answers.report
+        clues.append({'clue': clue_text,
+                      'seconds': seconds,
+                      'parses': report['total_parses'],
+                      'candidates': len(solver.answers_with_clues),
+                      'bigram_filter': report['bigram_filter'],
+                      'insertions': report['insertions'],
+                      'correct': len(answers) > 0 and answers[0].answer.lower() == known_answer})
+    latencies = [c['seconds'] for c in clues]
+    summary = dict(('p{}'.format(p), percentile(latencies, p)) for p in PERCENTILES)
+    summary.update({'clues': len(clues),
+                    'total_seconds': sum(latencies),
+                    'max': max(latencies) if latencies else 0,
+                    'parses': sum(c['parses'] for c in clues),
+                    'candidates': sum(c['candidates'] for c in clues),
+                    'correct': sum(1 for c in clues if c['correct'])})
+    return summary, clues
+
+
+def time_per_call(f, repeat=3, min_seconds=0.2):
+    """
+    Best-of-repeat seconds per call of f().
+    """
+    best = None
+    for _ in range(repeat):
+        calls = 0
+        start = time.time()
+        while True:
+            f()
+            calls += 1
+            elapsed = time.time() - start
+            if elapsed >= min_seconds:
+                break
+        if best is None or elapsed / calls < best:
+            best = elapsed / calls
+    return best
+
+
+def micro_benchmarks():
+    one_word = Constraints(phrases=[], lengths=(8,), pattern='', known_answer='')
+    two_words = Constraints(phrases=[], lengths=(4, 5), pattern='', known_answer='')
+    candidates = [w + x for w in ['arts', 'rats', 'star', 'tars', 'tsar'] for x in ['train', 'rniat', 'ntria']]
+    phrases = 'reap pleasure holding fruit'.split()
+    clue = Constraints(phrases=phrases, lengths=(5,), pattern='', known_answer='')
+    return {'anagrams': time_per_call(lambda: anagrams(['trainees'], one_word)),
+            'all_insertions': time_per_call(lambda: all_insertions(['rat', 'strain'], two_words)),
+            'bigram_filter': time_per_call(lambda: bigram_filter(candidates, two_words)),
+            'phrasings': time_per_call(lambda: phrasings(phrases)),
+            'generate_clues': time_per_call(lambda: [generate_clues(clue._replace(phrases=p)) for p in phrasings(phrases)])}
+
+
+def run_benchmarks(corpora=CORPORA, micro=True):
+    report = {'corpora': dict(), 'clues': dict()}
+    with CrypticClueSolver(instrument=True) as solver:
+        solver.quiet = True
+        for fname in corpora:
+            report['corpora'][fname], report['clues'][fname] = bench_corpus(solver, fname)
+    if micro:
+        report['micro'] = micro_benchmarks()
+    report['peak_rss_kb'] = peak_rss_kb()
+    report['load_seconds'] = load_timings()
+    return report
+
+
+def compare(report, baseline, time_threshold=TIME_THRESHOLD, rss_threshold=RSS_THRESHOLD,
+            count_threshold=COUNT_THRESHOLD):
+    """
+    Return a list of messages describing each regression of report
+    against baseline. Corpora and micro-benchmarks missing from either
+    one are not compared.
+    """
+    regressions = []
+
+    def check_growth(name, value, base, threshold):
+        if base > 0 and value > base * (1 + threshold):
+            regressions.append("{}: {:.4g} vs {:.4g} (+{:.0%})".format(name, value, base, value / base - 1))
+
+    def check_change(name, value, base, threshold):
+        if abs(value - base) > base * threshold:
+            regressions.append("{}: {} vs {}".format(name, value, base))
+
+    for fname, summary in report['corpora'].items():
+        base = baseline['corpora'].get(fname)
+        if base is None:
+            continue
+        for p in PERCENTILES:
+            key = 'p{}'.format(p)
+            check_growth('{} {}'.format(fname, key), summary[key], base[key], time_threshold)
+        for key in ['parses', 'candidates']:
+            check_change('{} {}'.format(fname, key), summary[key], base[key], count_threshold)
+        if summary['correct'] < base['correct']:
+            regressions.append("{} correct: {} vs {}".format(fname, summary['correct'], base['correct']))
+    for name, seconds in report.get('micro', dict()).items():
+        if name in baseline.get('micro', dict()):
+            check_growth(name, seconds, baseline['micro'][name], time_threshold)
+    check_growth('peak_rss_kb', report['peak_rss_kb'], baseline['peak_rss_kb'], rss_threshold)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the solver on the clue corpora")
+    parser.add_argument('corpora', nargs='*', default=CORPORA, help="clue files (default: the three in clues/)")
+    parser.add_argument('-o', '--output', help="write the full report as JSON")
+    parser.add_argument('--baseline', help="baseline report to check for regressions against")
+    parser.add_argument('--save-baseline', help="write the report as a new baseline")
+    parser.add_argument('--no-micro', action='store_true', help="skip the micro-benchmarks")
+    parser.add_argument('--time-threshold', type=float, default=TIME_THRESHOLD)
+    parser.add_argument('--rss-threshold', type=float, default=RSS_THRESHOLD)
+    parser.add_argument('--count-threshold', type=float, default=COUNT_THRESHOLD)
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.corpora, not args.no_micro)
+    for fname in args.corpora:
+        summary = report['corpora'][fname]
+        print "{}: {} clues, {} correct, p50 {:.2f}s, p90 {:.2f}s, p99 {:.2f}s, {} parses, {} candidates".format(
+            fname, summary['clues'], summary['correct'], summary['p50'], summary['p90'], summary['p99'],
+            summary['parses'], summary['candidates'])
+    for name, seconds in sorted(report.get('micro', dict()).items()):
+        print "{}: {:.3g} ms per call".format(name, seconds * 1000)
+    print "peak RSS: {} kB".format(report['peak_rss_kb'])
+    for name, seconds in report['load_seconds'].items():
+        print "loaded {} in {:.2f}s".format(name, seconds)
+
+    for fname in [args.output, args.save_baseline]:
+        if fname:
+            with open(fname, 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.time_threshold, args.rss_threshold, args.count_threshold)
+        for r in regressions:
+            print "REGRESSION " + r
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
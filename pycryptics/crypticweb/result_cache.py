@@ -0,0 +1,131 @@
+from pycryptics.solve_clue import ClueSolutions, split_clue_text
+from pycryptics.utils.lru import LRUCache
+import hashlib
+import json
+import threading
+import time
+
+"""
+Caches of solved clues for the web front ends, so that popular clues
+are only solved once. Results are stored in a plain JSON form (see
+ClueSolutions.serialize) so that any backend can hold them and any
+worker can use another's hits.
+"""
+
+
+def clue_cache_key(clue_text):
+    """
+    The cache key for a clue: its phrases, lengths and pattern as parsed
+    by split_clue_text, so that clues differing only in case, spacing or
+    punctuation share an entry. An all-dots pattern means the same as no
+    pattern. Any other pattern is part of the key, so a narrower pattern
+    never gets the answers cached for a broader one.
+    """
+    phrases, lengths, pattern, answer = split_clue_text(clue_text)
+    if pattern.replace('.', '') == '':
+        pattern = ''
+    normalized = json.dumps([phrases, lengths, pattern])
+    return hashlib.sha1(normalized).hexdigest()
+
+
+class LRUBackend(object):
+    """
+    In-process backend holding at most maxsize results.
+    """
+    def __init__(self, maxsize=1000):
+        self.entries = LRUCache(maxsize)
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires is not None and expires < time.time():
+            return None
+        return value
+
+    def set(self, key, value, ttl=None):
+        self.entries.put(key, (value, time.time() + ttl if ttl else None))
+
+
+class SQLiteBackend(object):
+    """
+    On-disk backend which can be shared by several server processes on
+    one machine. Holds at most maxsize results, dropping the least
+    recently used ones first.
+    """
+    def __init__(self, fname, maxsize=100000):
+        # not available on App Engine, which uses MemcacheBackend instead
+        import sqlite3
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(fname, check_same_thread=False)
+        with self._lock:
+            self._db.execute("CREATE TABLE IF NOT EXISTS results "
+                             "(key TEXT PRIMARY KEY, value TEXT, expires REAL, used REAL)")
+            self._db.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT value, expires FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, expires = row
+            if expires is not None and expires < now:
+                self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+            self._db.execute("UPDATE results SET used = ? WHERE key = ?", (now, key))
+            self._db.commit()
+        return str(value)
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                             (key, value, now + ttl if ttl else None, now))
+            self._db.execute("DELETE FROM results WHERE key IN "
+                             "(SELECT key FROM results ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                             (self.maxsize,))
+            self._db.commit()
+
+
+class MemcacheBackend(object):
+    """
+    Backend for any memcached-compatible client with get(key) and
+    set(key, value, time=ttl), such as python-memcached or App Engine's
+    google.appengine.api.memcache. The server does its own eviction.
+    """
+    def __init__(self, client, prefix='cryptics:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, value, time=ttl or 0)
+
+
+class ResultCache(object):
+    """
+    Solved clues, stored in the given backend for ttl seconds (forever if
+    ttl is None).
+    """
+    def __init__(self, backend, ttl=None):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, clue_text):
+        value = self.backend.get(clue_cache_key(clue_text))
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return ClueSolutions.deserialize(value)
+
+    def put(self, clue_text, solutions):
+        self.backend.set(clue_cache_key(clue_text), solutions.serialize(), self.ttl)
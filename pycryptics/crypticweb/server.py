@@ -1,5 +1,8 @@
 import web
 from pycryptics.solve_clue import CrypticClueSolver, split_clue_text
+from pycryptics.crypticweb.result_cache import ResultCache, LRUBackend
+from pycryptics.crypticweb.solve_queue import SolveQueue
+import multiprocessing
 import webbrowser
 import re
 # from fake_solve_clue import FakeCrypticClueSolver as CrypticClueSolver
@@ -7,6 +10,22 @@ import re
 
 SERVER = "http://localhost:8080/solve/"
 
+# Processes used to solve the phrasings of each clue, shared by all requests
+SOLVER_WORKERS = multiprocessing.cpu_count()
+# Clues being solved at once; further requests wait in the queue
+MAX_CONCURRENT_SOLVES = 4
+# Clues being solved or waiting; further requests are turned away
+MAX_PENDING_SOLVES = 16
+# Seconds after which a solve is stopped and its answers so far returned
+SOLVE_TIMEOUT = 30
+# Distinct answers ranked and shown for each clue
+DISPLAYED_ANSWERS = 200
+# Solved clues remembered, and for how many seconds. Use a SQLiteBackend
+# or MemcacheBackend to share them between several server processes.
+RESULT_CACHE_SIZE = 1000
+RESULT_CACHE_TTL = 24 * 60 * 60
+
+
 class index:
     def GET(self):
         return render.index(SERVER)
@@ -30,11 +49,12 @@ class solve:
                 return render.solver(None, clue, "Something went wrong that I don't know how to handle. Here's python's attempt at an explanation:<br>" + str(e))
             if len(phrases) > 7:
                 return render.solver(None, clue, "Sorry, I can't reliably handle clues longer than 7 phrases yet. Try grouping some words into phrases by putting an underscore instead of a space between them")
-            solver.setup(clue)
-            solver.run()
-            answers = solver.collect_answers()
+            answers = solve_queue.solve(clue)
+            if answers is None:
+                web.ctx.status = '503 Service Unavailable'
+                return render.solver(None, clue, "Sorry, I'm busy solving lots of other clues right now. Please try again in a minute.")
             print "returning:", answers
-            return render.solver(answers, solver.clue_text, "")
+            return render.solver(answers, clue.encode('ascii', 'ignore'), "")
         else:
             return render.solver(None, "", "")
 
@@ -51,10 +71,13 @@ if __name__ == '__main__':
     urls = ('/', 'index',
             '/solve/(.*)', 'solve')
 
-    solver = CrypticClueSolver()
+    with CrypticClueSolver(workers=SOLVER_WORKERS) as solver:
+        result_cache = ResultCache(LRUBackend(RESULT_CACHE_SIZE), RESULT_CACHE_TTL)
+        solve_queue = SolveQueue(solver, MAX_CONCURRENT_SOLVES, MAX_PENDING_SOLVES, SOLVE_TIMEOUT, result_cache,
+                                 DISPLAYED_ANSWERS)
 
-    app = web.application(urls, globals())
-    print "Starting up server. Press Ctrl+c to shut down"
-    # webbrowser.open("http://localhost:8080", new=2)
-    app.run()
-    print "Shutting down...."
+        app = web.application(urls, globals())
+        print "Starting up server. Press Ctrl+c to shut down"
+        # webbrowser.open("http://localhost:8080", new=2)
+        app.run()
+        print "Shutting down...."
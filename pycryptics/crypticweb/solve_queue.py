@@ -0,0 +1,45 @@
+from multiprocessing.pool import ThreadPool
+import threading
+import time
+
+
+class SolveQueue(object):
+    """
+    Runs solves for concurrent requests on a bounded pool of threads,
+    which share the solver's worker processes. At most max_pending
+    requests may be solving or queued at once; beyond that, submit()
+    refuses new work straight away instead of letting requests pile up.
+    Clues found in result_cache are answered without being queued, and
+    clues solved to completion are added to it. Only the best top
+    distinct answers of each clue are ranked and kept.
+    """
+    def __init__(self, solver, threads, max_pending, timeout, result_cache=None, top=None):
+        self.solver = solver
+        self.top = top
+        self.result_cache = result_cache
+        self.threads = ThreadPool(threads)
+        self.pending = threading.BoundedSemaphore(max_pending)
+        self.timeout = timeout
+
+    def solve(self, clue):
+        """
+        Solve a clue, returning its ClueSolutions, or None if the server
+        is too busy to take it on.
+        """
+        if self.result_cache is not None:
+            answers = self.result_cache.get(clue)
+            if answers is not None:
+                return answers
+        if not self.pending.acquire(False):
+            return None
+        try:
+            # the deadline covers time spent waiting in the queue, too
+            deadline = time.time() + self.timeout
+            result = self.threads.apply_async(self.solver.solve, (clue, self.top, deadline))
+            answers = result.get()
+        finally:
+            self.pending.release()
+        # answers cut short by the timeout are returned, but not remembered
+        if self.result_cache is not None and answers.complete:
+            self.result_cache.put(clue, answers)
+        return answers
@@ -0,0 +1,15 @@
+import msgpack
+from pycryptics.utils.synonyms import SYNONYMS
+
+anagrams = dict()
+
+for word in SYNONYMS:
+    # keyed by sorted letter multiset, must match anagram_index.anagram_key
+    key = ''.join(sorted(word.lower().replace('_', '')))
+    anagrams.setdefault(key, set([])).add(word)
+
+for k in anagrams:
+    anagrams[k] = sorted(anagrams[k])
+
+with open('data/anagrams.msgpack', 'w') as f:
+    msgpack.dump(anagrams, f)
@@ -0,0 +1,23 @@
+import sys
+from pycryptics.solve_clue import split_clue_text
+from pycryptics.utils.phrasings import phrasings
+from pycryptics.grammar import clue_parse
+
+"""
+Precompute the parse forests read by grammar/clue_parse.py for the tag
+signature of every phrasing of every clue in the given clue files.
+"""
+
+clue_files = sys.argv[1:] or ['clues/known_clues.txt', 'clues/more_known_clues.txt']
+
+for fname in clue_files:
+    with open(fname, 'r') as f:
+        for clue_text in f.readlines():
+            if clue_text.strip() == '':
+                continue
+            phrases, lengths, pattern, answer = split_clue_text(clue_text)
+            for p in phrasings(phrases):
+                clue_parse.parse_forest(p)
+
+print len(clue_parse.FORESTS), "signatures"
+clue_parse.save_forests()
@@ -1,26 +1,72 @@
 import msgpack
 from pycryptics.utils.synonyms import SYNONYMS
 
-initial_ngrams = dict()
+
+def prefix_automaton(words):
+    """
+    Build the minimal automaton accepting every prefix of the given
+    words (a DAWG), returned as a flat dict of transitions
+    (state << 8 | ord(letter)) -> next state, with the start state 0.
+    """
+    trie = [{}]
+    for word in words:
+        state = 0
+        for c in word:
+            if c not in trie[state]:
+                trie.append({})
+                trie[state][c] = len(trie) - 1
+            state = trie[state][c]
+
+    # merge states with identical outgoing transitions, leaves first
+    register = dict()
+    canonical = dict()
+
+    def minimize(state):
+        signature = tuple(sorted((c, minimize(child)) for c, child in trie[state].items()))
+        if signature not in register:
+            register[signature] = len(register)
+        canonical[state] = register[signature]
+        return canonical[state]
+
+    minimize(0)
+    # renumber so that the start state is 0
+    start = canonical[0]
+    renumber = lambda s: {start: 0, 0: start}.get(s, s)
+    transitions = dict()
+    for signature, state in register.items():
+        for c, child in signature:
+            transitions[(renumber(state) << 8) | ord(c)] = renumber(child)
+    return transitions
+
+
+words_by_length = dict()
 ngrams = dict()
+bigrams = dict()
 
 for word in SYNONYMS:
     if '_' in word:
         continue
     l = len(word)
+    words_by_length.setdefault(l, []).append(word)
     for i in range(len(word) + 1):
-        initial_ngrams.setdefault(l, set([])).add(word[:i])
         for j in range(len(word) - i + 1):
             ngrams.setdefault(l, set([])).add(word[j: j + i])
+    for j in range(len(word) - 1):
+        bigrams.setdefault(l, set([])).add(word[j: j + 2])
 
-for k in initial_ngrams:
-    initial_ngrams[k] = list(initial_ngrams[k])
+prefix_automata = dict()
+for l, words in words_by_length.items():
+    prefix_automata[l] = prefix_automaton(words)
 for k in ngrams:
     ngrams[k] = list(ngrams[k])
+for k in bigrams:
+    bigrams[k] = sorted(bigrams[k])
 
-with open('data/initial_ngrams.msgpack', 'w') as f:
-    msgpack.dump(initial_ngrams, f)
+with open('data/prefix_automata.msgpack', 'w') as f:
+    msgpack.dump(prefix_automata, f)
+
+with open('data/bigrams.msgpack', 'w') as f:
+    msgpack.dump(bigrams, f)
 
 with open('data/ngrams.msgpack', 'w') as f:
     msgpack.dump(ngrams, f)
-
@@ -0,0 +1,25 @@
+import sys
+from pycryptics.solve_clue import CrypticClueSolver
+from pycryptics.utils import language
+
+"""
+Precompute the (answer, definition) similarity table read by
+utils/language.py by solving every clue in the given clue files and
+saving every score computed along the way.
+"""
+
+clue_files = sys.argv[1:] or ['clues/known_clues.txt', 'clues/more_known_clues.txt']
+
+with CrypticClueSolver() as solver:
+    solver.quiet = True
+    for fname in clue_files:
+        with open(fname, 'r') as f:
+            for clue_text in f.readlines():
+                if clue_text.strip() == '':
+                    continue
+                print clue_text.strip()
+                solver.setup(clue_text)
+                solver.run()
+
+print language.SIMILARITIES.stats()
+language.save_similarities()
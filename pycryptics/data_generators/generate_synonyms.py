@@ -1,5 +1,5 @@
 import re
-import msgpack
+from pycryptics.utils.sorted_store import write_sorted_store
 from nltk.corpus import wordnet as wn
 # from nltk.tag import pos_tag
 import json
@@ -109,8 +109,9 @@ def main():
         all_synonyms[k] = list(set(v))
     print 'removed duplicates'
 
-    with open('data/synonyms.msgpack', 'w') as f:
-        msgpack.dump(all_synonyms, f)
+    write_sorted_store(dict((k.encode('ascii', 'ignore'), [v.encode('ascii', 'ignore') for v in vals])
+                            for k, vals in all_synonyms.items()),
+                       'data/synonyms.dat', length_index=True)
 
     with open('data/synonyms.json', 'w') as f:
         json.dump(all_synonyms, f, separators=(',', ':'), indent=0)
@@ -1,44 +1,87 @@
-import nltk.grammar as gram
 import pycryptics.grammar.nodes as nd
-from pycryptics.utils.indicators import INDICATORS
+from pycryptics.utils.indicators import INDICATOR_MATCHER
+from pycryptics.utils.lru import LRUCache
 
 """
 A Context Free Grammar (CFG) to describe allowed substructures of cryptic crossword clues and how to solve each substructure.
 """
 
+
+class Nonterminal(object):
+    """
+    A grammar symbol standing for a node class. Like nltk's Nonterminal,
+    but the grammar is only turned into nltk's classes when an nltk
+    parser needs it (see nltk_grammar), so that solving clues does not
+    import nltk.
+    """
+    __slots__ = ['_symbol']
+
+    def __init__(self, symbol):
+        self._symbol = symbol
+
+    def symbol(self):
+        return self._symbol
+
+    def __eq__(self, other):
+        return isinstance(other, Nonterminal) and self._symbol == other._symbol
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self._symbol)
+
+    def __repr__(self):
+        return '%s' % (self._symbol,)
+
+
+class Production(object):
+    __slots__ = ['_lhs', '_rhs']
+
+    def __init__(self, lhs, rhs):
+        self._lhs = lhs
+        self._rhs = tuple(rhs)
+
+    def lhs(self):
+        return self._lhs
+
+    def rhs(self):
+        return self._rhs
+
+
 # The basic wordplay transforms
-top = gram.Nonterminal(nd.TopNode)
-lit = gram.Nonterminal(nd.LitNode)
-d = gram.Nonterminal(nd.DNode)
-syn = gram.Nonterminal(nd.SynNode)
-first = gram.Nonterminal(nd.FirstNode)
-null = gram.Nonterminal(nd.NullNode)
+top = Nonterminal(nd.TopNode)
+lit = Nonterminal(nd.LitNode)
+d = Nonterminal(nd.DNode)
+syn = Nonterminal(nd.SynNode)
+first = Nonterminal(nd.FirstNode)
+null = Nonterminal(nd.NullNode)
 
 # Clue functions
-ana = gram.Nonterminal(nd.AnaNode)
-sub = gram.Nonterminal(nd.SubNode)
-sub_init = gram.Nonterminal(nd.SubInitNode)
-sub_final = gram.Nonterminal(nd.SubFinalNode)
-ins = gram.Nonterminal(nd.InsNode)
-rev = gram.Nonterminal(nd.RevNode)
+ana = Nonterminal(nd.AnaNode)
+sub = Nonterminal(nd.SubNode)
+sub_init = Nonterminal(nd.SubInitNode)
+sub_final = Nonterminal(nd.SubFinalNode)
+ins = Nonterminal(nd.InsNode)
+rev = Nonterminal(nd.RevNode)
 
 # ana_, rev_, etc. are anagram/reversal/etc indicators,
 # so they produce no text in the wordplay output
-ana_ = gram.Nonterminal(nd.AnaIndNode)
-sub_ = gram.Nonterminal(nd.SubIndNode)
-sub_init_ = gram.Nonterminal(nd.SubInitIndNode)
-sub_final_ = gram.Nonterminal(nd.SubFinalIndNode)
-ins_ = gram.Nonterminal(nd.InsIndNode)
-rev_ = gram.Nonterminal(nd.RevIndNode)
+ana_ = Nonterminal(nd.AnaIndNode)
+sub_ = Nonterminal(nd.SubIndNode)
+sub_init_ = Nonterminal(nd.SubInitIndNode)
+sub_final_ = Nonterminal(nd.SubFinalIndNode)
+ins_ = Nonterminal(nd.InsIndNode)
+rev_ = Nonterminal(nd.RevIndNode)
 ind_nodes = [nd.AnaIndNode, nd.SubIndNode, nd.SubFinalIndNode, nd.SubInitIndNode, nd.InsIndNode, nd.RevIndNode]
 
 # All the *_arg elements just exist to make the production rules more clear
 # so they just pass their inputs literally
-clue_arg = gram.Nonterminal(nd.ClueArgNode)
-ins_arg = gram.Nonterminal(nd.InsArgNode)
-ana_arg = gram.Nonterminal(nd.AnaArgNode)
-sub_arg = gram.Nonterminal(nd.SubArgNode)
-rev_arg = gram.Nonterminal(nd.RevArgNode)
+clue_arg = Nonterminal(nd.ClueArgNode)
+ins_arg = Nonterminal(nd.InsArgNode)
+ana_arg = Nonterminal(nd.AnaArgNode)
+sub_arg = Nonterminal(nd.SubArgNode)
+rev_arg = Nonterminal(nd.RevArgNode)
 
 production_rules = {
     ins: [[ins_arg, ins_, ins_arg], [ins_arg, ins_arg, ins_]],
@@ -69,7 +112,7 @@ for r in additional_clue_rules:
 base_prods = []
 for n, rules in production_rules.items():
     for r in rules:
-        base_prods.append(gram.Production(n, r))
+        base_prods.append(Production(n, r))
 
 known_functions = {'in': [ins_, lit, null, sub_],
                    'a': [lit, syn, null],
@@ -83,20 +126,67 @@ known_functions = {'in': [ins_, lit, null, sub_],
                    'with': [null, ins_]}
 
 
+# every nonterminal which may tag a phrase, by node name
+tag_nonterminals = dict((n.symbol().name, n) for n in [lit, d, syn, first, null, ana_, sub_, sub_init_, sub_final_, ins_, rev_])
+
+# every node class in the grammar, by name
+node_classes = dict((n.symbol().name, n.symbol()) for n in production_rules.keys() + tag_nonterminals.values())
+
+# nonterminals and base productions as small ints, for the forest parser
+# (see grammar/forest.py)
+nonterminals = sorted(node_classes.keys())
+nonterminal_ids = dict((name, i) for i, name in enumerate(nonterminals))
+productions = [(nonterminal_ids[p.lhs().symbol().name], tuple(nonterminal_ids[r.symbol().name] for r in p.rhs()))
+               for p in base_prods]
+
+
+# tags of each phrase seen so far
+PHRASE_TAGS = LRUCache(50000)
+
+
+def phrase_tags(p):
+    """
+    The nonterminals which may produce phrase p.
+    """
+    if p in known_functions:
+        return known_functions[p]
+    tags = PHRASE_TAGS.get(p)
+    if tags is None:
+        kinds = INDICATOR_MATCHER.kinds(p)
+        found = [Nonterminal(ind) for ind in ind_nodes if ind.name in kinds]
+        if found:
+            tags = [lit, d, syn, first] + found
+        else:
+            tags = [lit, d, syn, first, ana_, sub_, sub_init_, sub_final_, rev_]
+        PHRASE_TAGS.put(p, tags)
+    return tags
+
+
+def tag_signature(phrases):
+    """
+    The names of the tags of each phrase. Clues with the same signature
+    have the same parses, up to the phrases at their leaves.
+    """
+    return tuple(tuple(t.symbol().name for t in phrase_tags(p)) for p in phrases)
+
+
 def generate_grammar(phrases):
     prods = []
     for p in phrases:
-        if p in known_functions:
-            tags = known_functions[p]
-        else:
-            found = False
-            tags = [lit, d, syn, first]
-            for ind in ind_nodes:
-                if any(w == p or (len(w) > 5 and abs(len(w) - len(p)) <= 3 and p.startswith(w[:-3])) for w in INDICATORS[ind.name]):
-                    tags.append(gram.Nonterminal(ind))
-                    found = True
-            if not found:
-                tags = [lit, d, syn, first, ana_, sub_, sub_init_, sub_final_, rev_]
-        for t in tags:
-            prods.append(gram.Production(t, [p]))
-    return gram.ContextFreeGrammar(top, base_prods + prods)
+        for t in phrase_tags(p):
+            prods.append(Production(t, [p]))
+    return nltk_grammar(base_prods + prods)
+
+
+def nltk_grammar(prods):
+    """
+    An nltk ContextFreeGrammar with the given productions, starting from
+    top.
+    """
+    import nltk.grammar as gram
+
+    def symbol(x):
+        return gram.Nonterminal(x.symbol()) if isinstance(x, Nonterminal) else x
+
+    return gram.ContextFreeGrammar(symbol(top), [gram.Production(symbol(p.lhs()), [symbol(x) for x in p.rhs()])
+                                                 for p in prods])
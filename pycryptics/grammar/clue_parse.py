@@ -1,12 +1,84 @@
-from pycryptics.grammar.cfg import generate_grammar
-from pycryptics.grammar.memo_chart import MemoChart
-from nltk import parse
+from pycryptics.grammar.cfg import tag_signature
+from pycryptics.grammar.forest import ParseForest, ForestSolver
+from pycryptics.utils.lru import LRUCache
+from pycryptics.utils.instrumentation import current_stats
+from pycryptics.utils.data_files import register, data_path
+import msgpack
+import os
 
+"""
+Clues are parsed by tag signature (see cfg.tag_signature) rather than by
+their phrases, since phrases with the same tags can appear in exactly the
+same places. Each signature is parsed once into a ParseForest, whose
+parses are then filled in with the phrases of every clue with that
+signature.
+"""
 
-def generate_clues(constraints):
-    g = generate_grammar(constraints.phrases)
-    parser = parse.EarleyChartParser(g, chart_class=MemoChart)
-    clues = parser.nbest_parse(constraints.phrases)
+FORESTS_FILE = 'data/clue_forests.msgpack'
+
+# parse forest for each tag signature
+FORESTS = LRUCache(20000)
+
+
+def load_forests(fname):
+    """
+    Seed FORESTS from a precomputed table, if there is one. See
+    data_generators/generate_forests.py.
+    """
+    if os.path.exists(fname):
+        with open(fname, 'rb') as f:
+            for signature, edges in msgpack.load(f, use_list=False):
+                signature = tuple(tuple(str(name) for name in names) for names in signature)
+                FORESTS.put(signature, ParseForest(signature, dict(edges)))
+    return FORESTS
+
+
+SEEDED_FORESTS = register('forests', FORESTS_FILE, load_forests)
+
+
+def save_forests(fname=None):
+    SEEDED_FORESTS.value()
+    with open(fname or data_path(FORESTS_FILE), 'wb') as f:
+        msgpack.dump([(signature, forest.edges.items()) for signature, forest in FORESTS.items()], f)
+
+
+def parse_forest(phrases):
+    SEEDED_FORESTS.value()
+    signature = tag_signature(phrases)
+    forest = FORESTS.get(signature)
+    if forest is None:
+        forest = ParseForest(signature)
+        FORESTS.put(signature, forest)
+    return forest
+
+
+def counted_parse_forest(phrases):
+    """
+    parse_forest, also timing it and counting its parses when solve
+    instrumentation is on.
+    """
+    stats = current_stats()
+    if stats is None:
+        return parse_forest(phrases)
+    with stats.phase('parse'):
+        forest = parse_forest(phrases)
+    stats.count_parses(phrases, forest.count_parses())
+    return forest
+
+
+def generate_clues(constraints, answer_cache=None, cancel=None):
+    clues = counted_parse_forest(constraints.phrases).trees(constraints.phrases)
     for c in clues:
-        c.set_constraints(constraints)
+        c.set_constraints(constraints, answer_cache, cancel)
     return clues
+
+
+def solve_clues(constraints, answer_cache=None, cancel=None):
+    """
+    Solve every parse of the clue at once over its parse forest (see
+    forest.ForestSolver), yielding (clues, pruned_by_depth) for each
+    top-level alternative, where clues holds one solved ClueTree per
+    answer.
+    """
+    forest = counted_parse_forest(constraints.phrases)
+    return ForestSolver(forest, constraints.phrases, constraints, answer_cache, cancel).solve()
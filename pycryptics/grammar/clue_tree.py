@@ -1,28 +1,205 @@
-from nltk.parse.chart import Tree
-from pycryptics.utils.transforms import valid_partial_answer
+import time
+from pycryptics.utils.transforms import start_partial_answer, extend_partial_answer
+from pycryptics.utils.instrumentation import current_stats
+from pycryptics.utils.lru import LRUCache
 
 
 def arg_filter(arg_set):
-    if arg_set != [""]:
+    if len(arg_set) != 1 or arg_set[0] != "":
         return [a for a in arg_set if not a == ""]
-    return arg_set
+    return list(arg_set)
+
+
+def make_top_arg_sets(child_answers, constraints, cancel=None):
+    """
+    Combine the children's answers left to right, depth first, keeping
+    only those combinations (as tuples) which make a valid answer, and
+    dropping each partial combination as soon as it could no longer
+    start one. Each partial combination carries its resumable
+    partial-answer state, so adding a child's answer only checks that
+    answer's letters. Only the current path and the complete
+    combinations are held in memory. The combinations are returned in
+    the same order as make_arg_sets would give them, along with the
+    number rejected after each child.
+    """
+    target_len = sum(constraints.lengths)
+    pruned_by_depth = [0] * len(child_answers)
+    found = []
+
+    def extend(depth, args, index, state):
+        if depth == len(child_answers):
+            if state[0] == target_len:
+                found.append((index[::-1], args))
+            return
+        if cancel is not None:
+            cancel.check()
+        for i, ans in enumerate(child_answers[depth]):
+            new_state = extend_partial_answer(state, ans, constraints)
+            if new_state is None:
+                pruned_by_depth[depth] += 1
+            else:
+                extend(depth + 1, args + (ans,), index + (i,), new_state)
+
+    extend(0, (), (), start_partial_answer(constraints))
+    # the last child's answer changes slowest, as in make_arg_sets
+    found.sort(key=lambda f: f[0])
+    return [args for index, args in found], pruned_by_depth
+
+
+def make_arg_sets(child_answers, max_length=None):
+    """
+    Lazily yield every combination of the children's answers, as a
+    tuple, with the first child's answer changing fastest. If
+    max_length is given, combinations with more letters than that are
+    skipped without being built.
+    """
+    if max_length is None:
+        max_length = float('inf')
+
+    def extend(depth, args, budget):
+        # fill in the children from the last one down to the first
+        if depth == 0:
+            yield args
+            return
+        for ans in child_answers[depth - 1]:
+            n = len(ans.replace('_', ''))
+            if n > budget:
+                continue
+            for arg_set in extend(depth - 1, (ans,) + args, budget - n):
+                yield arg_set
+
+    return extend(len(child_answers), (), max_length)
+
+
+def apply_rule(node, arg_sets, constraints):
+    """
+    Yield (answer, args) for each answer of the node's rule applied to
+    each of arg_sets.
+    """
+    stats = current_stats()
+    for args in arg_sets:
+        if stats is None:
+            answers = node.apply_rule(arg_filter(args), constraints)
+        else:
+            answers = stats.apply_rule(node, arg_filter(args), constraints)
+        for ans in answers or []:
+            yield ans, args
+
+
+def node_answers(node, child_answers, constraints):
+    """
+    Yield (answer, args) for the node's rule applied to every
+    combination args of its children's answers, handing them all to its
+    apply_rule_sets at once if it has one (see nodes.BaseNode).
+    """
+    if node.apply_rule_sets is not None:
+        stats = current_stats()
+        if stats is None:
+            results = node.apply_rule_sets(child_answers, constraints)
+        else:
+            results = stats.apply_rule_sets(node, child_answers, constraints)
+        if results is not None:
+            return results
+    max_length = sum(constraints.lengths) if node.length_bounded else None
+    return apply_rule(node, make_arg_sets(child_answers, max_length), constraints)
 
 
 class ClueUnsolvableError(Exception):
     pass
 
 
+class SolveCancelled(Exception):
+    pass
+
+
+class CancelToken(object):
+    """
+    Shared between a solver and the trees it is solving, so that solving
+    can be interrupted from outside (by cancel(), e.g. from another
+    thread) or once a deadline, in time.time() seconds, has passed.
+    Trees check it each time they start solving a node.
+    """
+    def __init__(self, deadline=None):
+        self.cancelled = False
+        self.deadline = deadline
+
+    def cancel(self):
+        self.cancelled = True
+
+    def stopped(self):
+        return self.cancelled or (self.deadline is not None and time.time() > self.deadline)
+
+    def check(self):
+        if self.stopped():
+            raise SolveCancelled()
+
+
+class AnswerCache(object):
+    """
+    Answer dicts of already-solved subtrees, shared by every parse of
+    every phrasing of a single clue. Entries are keyed by the subtree's
+    full structure (see ClueTree.structure) and the constraints which
+    affect its answers, so identical subtrees in different parses are
+    only solved once. With maxsize, at most that many entries are kept,
+    dropping the least recently used, as when it is shared by a whole
+    batch of clues.
+    """
+    def __init__(self, maxsize=None):
+        self._answers = dict() if maxsize is None else LRUCache(maxsize)
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        answers = self._answers.get(key)
+        if answers is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return answers
+
+    def put(self, key, answers):
+        if self.maxsize is None:
+            self._answers[key] = answers
+        else:
+            self._answers.put(key, answers)
+
+    def __len__(self):
+        return len(self._answers)
+
+
+class Tree(list):
+    """
+    A node together with a list of children, as in nltk's Tree, of which
+    clue trees only need this much. Defined here so that solving clues
+    does not import nltk.
+    """
+    def __init__(self, node, children=()):
+        list.__init__(self, children)
+        self.node = node
+
+    def __eq__(self, other):
+        return isinstance(other, Tree) and self.node == other.node and list.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self == other
+
+
 class ClueTree(Tree):
     """
     A tree data structure designed to reflect the CFG structure of a
     cryptic crossword clue, along with all of the mechanisms required
     to solve that clue and explain the answer
     """
-    __slots__ = ['_answers', 'constraints']
+    __slots__ = ['_answers', 'constraints', 'pruned_by_depth', '_answer_cache', '_structure', '_cancel']
 
     def __init__(self, node_or_str, children=None):
         self._answers = None
         self._constraints = None
+        self._answer_cache = None
+        self._structure = None
+        self._cancel = None
+        self.pruned_by_depth = []
         super(ClueTree, self).__init__(node_or_str, children)
 
     def __str__(self):
@@ -34,54 +211,66 @@ class ClueTree(Tree):
     def __repr__(self):
         return self.__str__()
 
-    def set_constraints(self, constraints):
+    def __reduce__(self):
+        # Keep the solved answers when pickling (e.g. to send results back
+        # from a worker process), but not the per-clue answer cache.
+        return (self.__class__, (self.node, list(self)),
+                (self._answers, self._constraints, self.pruned_by_depth))
+
+    def __setstate__(self, state):
+        self._answers, self._constraints, self.pruned_by_depth = state
+
+    def resolve(self):
+        """
+        Solve every subtree, so that the tree can be explained without
+        its answer cache, as when it is sent back from a worker process.
+        A subtree whose answers came from the cache has not had its own
+        children solved.
+        """
+        for child in self:
+            if isinstance(child, ClueTree):
+                child.answers
+                child.resolve()
+
+    def set_constraints(self, constraints, answer_cache=None, cancel=None):
         self._constraints = constraints
+        self._answer_cache = answer_cache
+        self._cancel = cancel
         for c in self:
             if (not isinstance(c, str)) and c._constraints is None:
-                c.set_constraints(constraints)
+                c.set_constraints(constraints, answer_cache, cancel)
+
+    @property
+    def structure(self):
+        """
+        A hashable description of the whole subtree: its node name and
+        the structures of its children (or the leaf strings themselves).
+        """
+        if self._structure is None:
+            self._structure = (self.node.name, tuple(c if isinstance(c, str) else c.structure for c in self))
+        return self._structure
+
+    def answer_cache_key(self):
+        return (self.structure, self._constraints.lengths, self._constraints.pattern)
 
     def solve(self):
+        if self._cancel is not None:
+            self._cancel.check()
         child_answers = [ClueTree.get_answers(c) for c in self]
         for i, s in enumerate(child_answers):
             if isinstance(s, dict):
                 child_answers[i] = s.keys()
         if self.node.name == 'top':
-            arg_sets = self.make_top_arg_sets(child_answers)
+            answers = apply_rule(self.node, self.make_top_arg_sets(child_answers), self._constraints)
         else:
-            arg_sets = self.make_arg_sets(child_answers)
+            answers = node_answers(self.node, child_answers, self._constraints)
         if self._answers is None:
             self._answers = {}
-        for args in arg_sets:
-            answers = self.node.apply_rule(arg_filter(args), self._constraints)
-            # answers = RULES[self.node](arg_filter(args), self._constraints)
-            if answers is None:
-                answers = []
-            for ans in answers:
-                self._answers[ans] = args[:]
+        for ans, args in answers:
+            self._answers[ans] = args
 
     def make_top_arg_sets(self, child_answers):
-        target_len = sum(self._constraints.lengths)
-        arg_sets = [([], 0, '')]
-        for ans_list in child_answers:
-            new_arg_sets = []
-            for ans in ans_list:
-                for s in arg_sets:
-                    candidate = (s[0] + [ans], s[1] + len(ans), s[2] + ans)
-                    if valid_partial_answer(candidate[2], self._constraints):
-                    # if candidate[1] <= target_len:
-                        new_arg_sets.append(candidate)
-            arg_sets = new_arg_sets
-        return [s[0] for s in arg_sets if s[1] == target_len]
-
-    def make_arg_sets(self, child_answers):
-        # return itertools.product(*child_answers)
-        arg_sets = [[]]
-        for ans_list in child_answers:
-            new_arg_sets = []
-            for ans in ans_list:
-                for s in arg_sets:
-                    new_arg_sets.append(s + [ans])
-            arg_sets = new_arg_sets
+        arg_sets, self.pruned_by_depth = make_top_arg_sets(child_answers, self._constraints, self._cancel)
         return arg_sets
 
     @staticmethod
@@ -93,9 +282,21 @@ class ClueTree(Tree):
 
     @property
     def answers(self):
-        if self._answers is None:
-            self._answers = {}
-            self.solve()
+        try:
+            if self._answers is None and self._answer_cache is not None:
+                key = self.answer_cache_key()
+                self._answers = self._answer_cache.get(key)
+                if self._answers is None:
+                    self._answers = {}
+                    self.solve()
+                    self._answer_cache.put(key, self._answers)
+            if self._answers is None:
+                self._answers = {}
+                self.solve()
+        except SolveCancelled:
+            # don't leave a half-solved answer dict behind
+            self._answers = None
+            raise
         if self._answers == {}:
             raise ClueUnsolvableError("This clue has no solutions under the given constraints: " + str(self._constraints))
         return self._answers
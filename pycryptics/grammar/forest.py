@@ -0,0 +1,238 @@
+from pycryptics.grammar.cfg import nonterminals, nonterminal_ids, productions, node_classes
+from pycryptics.grammar.clue_tree import ClueTree, apply_rule, node_answers, make_top_arg_sets
+import itertools
+
+"""
+A bottom-up chart parser for the clue grammar in cfg.py, producing a
+packed parse forest instead of a list of trees.
+
+An edge is a (nonterminal id, start, end) tuple, covering phrases start
+to end - 1. The forest maps each edge which can be derived to its
+alternatives: (production index, children) pairs, where children is a
+tuple of child edges, or (None, (start,)) for a phrase tagged with that
+nonterminal. Parses which share a subtree share its edge, so the forest
+stays small even when a clue has hundreds of parses.
+"""
+
+TOP = nonterminal_ids['top']
+
+productions_by_lhs = [[] for name in nonterminals]
+for i, (lhs, rhs) in enumerate(productions):
+    productions_by_lhs[lhs].append(i)
+
+
+def unary_order():
+    """
+    Nonterminals ordered so that each comes after every nonterminal it
+    can be rewritten to by a unary production, which lets each span be
+    filled in with a single pass.
+    """
+    order = []
+    visiting = set([])
+
+    def visit(nt):
+        if nt in order:
+            return
+        if nt in visiting:
+            raise ValueError("Unary cycle in the clue grammar at " + nonterminals[nt])
+        visiting.add(nt)
+        for p in productions_by_lhs[nt]:
+            rhs = productions[p][1]
+            if len(rhs) == 1:
+                visit(rhs[0])
+        order.append(nt)
+
+    for nt in range(len(nonterminals)):
+        visit(nt)
+    return order
+
+
+PARSE_ORDER = unary_order()
+
+
+class ParseForest(object):
+    """
+    All parses of a clue whose i'th phrase has the tags named in
+    signature[i] (see cfg.tag_signature).
+    """
+    def __init__(self, signature, edges=None):
+        self.n = len(signature)
+        self.root = (TOP, 0, self.n)
+        if edges is None:
+            edges = self.parse(signature)
+        self.edges = edges
+
+    def parse(self, signature):
+        tags = [set(nonterminal_ids[name] for name in names) for names in signature]
+        self.edges = dict()
+        for length in range(1, self.n + 1):
+            for start in range(0, self.n - length + 1):
+                end = start + length
+                for nt in PARSE_ORDER:
+                    alternatives = []
+                    if length == 1 and nt in tags[start]:
+                        alternatives.append((None, (start,)))
+                    for p in productions_by_lhs[nt]:
+                        rhs = productions[p][1]
+                        if len(rhs) <= length:
+                            for children in self.splits(rhs, start, end):
+                                alternatives.append((p, children))
+                    if alternatives:
+                        self.edges[(nt, start, end)] = alternatives
+        return self.edges
+
+    def splits(self, rhs, start, end):
+        """
+        Every way of covering start to end with edges for the symbols in
+        rhs, in order.
+        """
+        if len(rhs) == 1:
+            if (rhs[0], start, end) in self.edges:
+                return [((rhs[0], start, end),)]
+            return []
+        result = []
+        for mid in range(start + 1, end - len(rhs) + 2):
+            first = (rhs[0], start, mid)
+            if first in self.edges:
+                for rest in self.splits(rhs[1:], mid, end):
+                    result.append((first,) + rest)
+        return result
+
+    def reachable(self):
+        """
+        The edges which are part of at least one complete parse, children
+        before parents.
+        """
+        order = []
+        seen = set([])
+
+        def visit(edge):
+            if edge in seen:
+                return
+            seen.add(edge)
+            for p, children in self.edges[edge]:
+                if p is not None:
+                    for c in children:
+                        visit(c)
+            order.append(edge)
+
+        if self.root in self.edges:
+            visit(self.root)
+        return order
+
+    def count_parses(self):
+        """
+        The number of parses, without building them.
+        """
+        counts = dict()
+        for edge in self.reachable():
+            n = 0
+            for p, children in self.edges[edge]:
+                if p is None:
+                    n += 1
+                else:
+                    product = 1
+                    for c in children:
+                        product *= counts[c]
+                    n += product
+            counts[edge] = n
+        return counts.get(self.root, 0)
+
+    def trees(self, phrases):
+        """
+        Every parse of the given phrases as a ClueTree. As in nltk's
+        charts, parses share the ClueTrees of their common subtrees.
+        """
+        trees = dict()
+        for edge in self.reachable():
+            node = node_classes[nonterminals[edge[0]]]
+            edge_trees = []
+            for p, children in self.edges[edge]:
+                if p is None:
+                    edge_trees.append(ClueTree(node, [phrases[children[0]]]))
+                else:
+                    for combination in itertools.product(*[trees[c] for c in children]):
+                        edge_trees.append(ClueTree(node, list(combination)))
+            trees[edge] = edge_trees
+        return trees.get(self.root, [])
+
+
+class ForestSolver(object):
+    """
+    Solves every parse in a forest at once, by computing the answers of
+    each edge exactly once from the answers of its child edges, instead
+    of solving each parse's tree separately. Each edge's answers map to
+    a back-pointer (alternative index, child answers), from which a
+    single solved ClueTree can be rebuilt for any answer, so derivations
+    work as before. Only the root is kept split by alternative, since
+    each top-level alternative has its own definition.
+    """
+    def __init__(self, forest, phrases, constraints, answer_cache=None, cancel=None):
+        self.forest = forest
+        self.phrases = phrases
+        self.constraints = constraints
+        self.answer_cache = answer_cache
+        self.cancel = cancel
+        self.answers = dict()
+        self.trees = dict()
+
+    def edge_answers(self, edge):
+        answers = self.answers.get(edge)
+        if answers is not None:
+            return answers
+        nt, start, end = edge
+        # the edge's sub-forest only depends on the phrases it covers
+        key = ((nt, tuple(self.phrases[start:end])), self.constraints.lengths, self.constraints.pattern)
+        if self.answer_cache is not None:
+            answers = self.answer_cache.get(key)
+        if answers is None:
+            if self.cancel is not None:
+                self.cancel.check()
+            node = node_classes[nonterminals[nt]]
+            answers = dict()
+            for k, (p, children) in enumerate(self.forest.edges[edge]):
+                for ans, args in node_answers(node, self.child_answers(p, children), self.constraints):
+                    answers[ans] = (k, args)
+            if self.answer_cache is not None:
+                self.answer_cache.put(key, answers)
+        self.answers[edge] = answers
+        return answers
+
+    def child_answers(self, p, children):
+        if p is None:
+            return [[self.phrases[children[0]]]]
+        return [self.edge_answers(c).keys() for c in children]
+
+    def tree(self, edge, answer):
+        """
+        A solved ClueTree deriving answer from the edge.
+        """
+        tree = self.trees.get((edge, answer))
+        if tree is None:
+            k, args = self.edge_answers(edge)[answer]
+            p, children = self.forest.edges[edge][k]
+            tree = self.make_tree(edge[0], p, children, answer, args)
+            self.trees[(edge, answer)] = tree
+        return tree
+
+    def make_tree(self, nt, p, children, answer, args):
+        if p is None:
+            tree = ClueTree(node_classes[nonterminals[nt]], [self.phrases[children[0]]])
+        else:
+            tree = ClueTree(node_classes[nonterminals[nt]], [self.tree(c, a) for c, a in zip(children, args)])
+        tree._answers = {answer: args}
+        tree._constraints = self.constraints
+        return tree
+
+    def solve(self):
+        """
+        Yield (clues, pruned_by_depth) for each top-level alternative,
+        where clues holds one solved ClueTree per answer.
+        """
+        for p, children in self.forest.edges.get(self.forest.root, []):
+            child_answers = self.child_answers(p, children)
+            arg_sets, pruned_by_depth = make_top_arg_sets(child_answers, self.constraints, self.cancel)
+            answers = dict()
+            for ans, args in apply_rule(node_classes['top'], arg_sets, self.constraints):
+                answers[ans] = args
+            yield [self.make_tree(TOP, p, children, ans, args) for ans, args in answers.items()], pruned_by_depth
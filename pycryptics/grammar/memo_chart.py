@@ -1,4 +1,9 @@
 from __future__ import division
+"""
+nltk's Earley chart, reading its parses off as ClueTrees. The solver
+parses with grammar.forest instead; this is only the oracle which
+test_forest checks those parses against, and needs nltk < 3.0.
+"""
 from nltk.parse.earleychart import IncrementalChart
 from nltk.parse.chart import LeafEdge, Tree
 from pycryptics.grammar.clue_tree import ClueTree
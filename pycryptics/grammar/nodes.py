@@ -1,6 +1,6 @@
-from pycryptics.utils.synonyms import cached_synonyms
+from pycryptics.utils.synonyms import synonyms_up_to
 from pycryptics.utils.transforms import valid_answer
-from pycryptics.utils.clue_funcs import internal_substrings, reverse, anagrams, all_insertions, bigram_filter
+from pycryptics.utils.clue_funcs import internal_substrings, reverse, anagrams, all_insertions, bigram_filter, insertion_answers, count_insertions
 
 
 class BaseNode:
@@ -13,6 +13,15 @@ class BaseNode:
     never meant to be instantiated.
     """
     is_indicator = False
+    # Nodes may also define apply_rule_sets(child_answers, constraints),
+    # returning (answer, args) for every combination args of their
+    # children's answers at once, to avoid trying each combination
+    # separately (see clue_tree.node_answers).
+    apply_rule_sets = None
+    # True if an answer with more letters than the clue's answer can
+    # never be used, so that combinations of arguments longer than that
+    # need not be tried.
+    length_bounded = False
     is_argument = False
     name = "base"
     derivation_string = ""
@@ -78,7 +87,7 @@ class SynNode(BaseNode):
     @staticmethod
     def apply_rule(s, constraints):
         assert(len(s) == 1)
-        return cached_synonyms(s[0], sum(constraints.lengths) + 2)
+        return synonyms_up_to(s[0], sum(constraints.lengths) + 2)
 
 class FirstNode(BaseNode):
     name = 'first'
@@ -92,6 +101,7 @@ class FirstNode(BaseNode):
 class AnaNode(BaseNode):
     name = 'ana'
     derivation_string = "anagram {}"
+    length_bounded = True
 
     @staticmethod
     def apply_rule(s, c):
@@ -112,7 +122,7 @@ class SubInitNode(BaseNode):
     @staticmethod
     def apply_rule(words, constraints):
         assert len(words) == 1
-        word = words[0].lower().replace('_', "")
+        word = words[0].replace('_', "")
         length = sum(constraints.lengths)
         subs = set([])
         if len(word) <= 1:
@@ -130,7 +140,7 @@ class SubFinalNode(BaseNode):
     @staticmethod
     def apply_rule(words, constraints):
         assert len(words) == 1
-        word = words[0].lower().replace('_', "")
+        word = words[0].replace('_', "")
         subs = set([])
         if len(word) <= 1:
             return subs
@@ -141,11 +151,41 @@ class SubFinalNode(BaseNode):
 class InsNode(BaseNode):
     name = 'ins'
     derivation_string = "insert {} and {}"
+    length_bounded = True
 
     @staticmethod
     def apply_rule(s, c):
         return all_insertions(s, c)
 
+    @staticmethod
+    def apply_rule_sets(child_answers, constraints):
+        """
+        The insertions of every answer of one argument into every answer
+        of the other, found without trying every pair (see
+        clue_funcs.insertion_answers).
+        """
+        if not all(child_answers):
+            return []
+        args = tuple(list(answers)[0] for answers in child_answers)
+        slots = [i for i, answers in enumerate(child_answers) if list(answers) != [""]]
+        if len(slots) != 2:
+            return None
+        i, j = slots
+        # put them in the order in which trying each combination would
+        # find them (see clue_tree.make_arg_sets), so that the same
+        # arguments are kept for an answer found more than once
+        rank_i = dict((w, n) for n, w in enumerate(child_answers[i]))
+        rank_j = dict((w, n) for n, w in enumerate(child_answers[j]))
+        results = []
+        for ans, (word1, word2) in insertion_answers(child_answers[i], child_answers[j], constraints):
+            ans_args = list(args)
+            ans_args[i] = word1
+            ans_args[j] = word2
+            results.append(((rank_j[word2], rank_i[word1]), ans, tuple(ans_args)))
+        results.sort(key=lambda r: r[0])
+        count_insertions(len(child_answers[i]) * len(child_answers[j]), len(results))
+        return [(ans, ans_args) for _, ans, ans_args in results]
+
 class RevNode(BaseNode):
     name = 'rev'
     derivation_string = "reverse {}"
@@ -182,14 +222,19 @@ class ArgNode(BaseNode):
     def apply_rule(s, c):
         return s
 
+# clue_args only feed top, and ins_args and ana_args only ins and ana,
+# all of which use every letter of their arguments
 class ClueArgNode(ArgNode):
     name = 'clue_arg'
+    length_bounded = True
 
 class InsArgNode(ArgNode):
     name = 'ins_arg'
+    length_bounded = True
 
 class AnaArgNode(ArgNode):
     name = 'ana_arg'
+    length_bounded = True
 
 class SubArgNode(ArgNode):
     name = 'sub_arg'
@@ -323,10 +323,10 @@ class Puzzle:
     def intersecting_clues(self, clue):
         target_squares = self.occupied_squares(clue)
         if clue['dir'] == 'd':
-            source = self.across
+            source = self.clue_numbering().across
         else:
             assert clue['dir'] == 'a'
-            source = self.down
+            source = self.clue_numbering().down
         return [c for c in source if any(s in target_squares for s in self.occupied_squares(c))]
 
     def encode_clue_for_solver(self, clue):
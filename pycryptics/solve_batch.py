@@ -0,0 +1,65 @@
+"""
+Solve every clue in a clue file (one clue per line, in the format of
+clues/known_clues.txt) or a .puz file, writing one JSON object per clue
+to the output.
+
+    python pycryptics/solve_batch.py clues/known_clues.txt -w 4 -o results.jsonl
+"""
+import pycryptics.puzpy.puz as puz
+from pycryptics.solve_clue import CrypticClueSolver, split_clue_text
+import argparse
+import json
+import io
+import sys
+import time
+
+
+def read_clues(fname):
+    if fname.endswith('.puz'):
+        p = puz.read(fname)
+        numbering = p.clue_numbering()
+        return [p.encode_clue_for_solver(c) for c in numbering.across + numbering.down]
+    with io.open(fname, encoding='utf-8') as f:
+        return [line.strip() for line in f.readlines()
+                if line.strip() != '' and not line.startswith('//')]
+
+
+def result_record(index, clue_text, answers, seconds):
+    known_answer = split_clue_text(clue_text)[3].strip().lower()
+    record = {'index': index,
+              'clue': clue_text,
+              'seconds': round(seconds, 3),
+              'answers': [{'answer': a.answer,
+                           'similarity': a.similarity,
+                           'derivation': a.derivation()} for a in answers]}
+    if known_answer != '':
+        record['known_answer'] = known_answer
+        record['correct'] = len(answers) > 0 and answers[0].answer.lower() == known_answer
+    return record
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Solve a batch of cryptic clues")
+    parser.add_argument('clue_file', help="a clue file or a .puz file")
+    parser.add_argument('-o', '--output', help="JSON-lines output file (default: stdout)")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="number of worker processes")
+    parser.add_argument('-n', '--top', type=int, default=5, help="number of answers to keep per clue")
+    args = parser.parse_args()
+
+    clue_texts = read_clues(args.clue_file)
+    out = open(args.output, 'w') if args.output else sys.stdout
+    start = time.time()
+    try:
+        with CrypticClueSolver(workers=args.workers) as solver:
+            solver.quiet = True
+            for index, clue_text, answers, seconds in solver.solve_many(clue_texts, top=args.top):
+                out.write(json.dumps(result_record(index, clue_text, answers, seconds)) + '\n')
+                out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    sys.stderr.write("Solved {} clues in {:.1f} seconds\n".format(len(clue_texts), time.time() - start))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,22 +1,54 @@
 from __future__ import division
-from pycryptics.utils.language import semantic_similarity
-from pycryptics.grammar.clue_parse import generate_clues
+from pycryptics.utils.language import semantic_similarity, fast_semantic_similarity, SIMILARITIES, SYNSET_CLOSURES
+from pycryptics.grammar.clue_parse import generate_clues, solve_clues
 from pycryptics.utils.phrasings import phrasings
 from pycryptics.utils.synonyms import SYNONYMS
-from pycryptics.grammar.clue_tree import ClueUnsolvableError
-from collections import namedtuple
+from pycryptics.grammar.clue_tree import ClueTree, ClueUnsolvableError, AnswerCache, CancelToken, SolveCancelled
+from pycryptics.utils.lru import LRUCache
+from pycryptics.utils.instrumentation import SolveStats, collecting, timed_phase
+from pycryptics.utils import data_files
+from collections import namedtuple, deque
+import multiprocessing
+import threading
+import cProfile
+import json
+import time
 import re
 
 
 Constraints = namedtuple('Constraints', 'phrases lengths pattern known_answer')
 
-class AnnotatedAnswer:
+# Solves which may be running in a solver's worker pool at once, each
+# with its own cancel flag (see CancelSlots)
+MAX_POOL_SOLVES = 64
+# Seconds between checks for cancellation while waiting on the pool
+POLL_SECONDS = 0.1
+# Solved subtrees kept when a batch of clues shares its answer cache
+SHARED_ANSWER_CACHE_SIZE = 20000
+
+class AnnotatedAnswer(object):
+    """
+    An answer together with the parsed clue which produced it. The
+    similarity between the answer and the clue's definition is only
+    computed the first time it is needed, since ranking usually only
+    needs it for some of the answers.
+    """
     def __init__(self, ans, clue):
         self.answer = ans.encode('ascii', 'replace')
         self.clue = clue
         d_tree = clue[[x.node.name for x in clue].index('d')]
         self.definition = d_tree[0]
-        self.similarity = semantic_similarity(self.answer, self.definition)
+        self._similarity = None
+
+    @property
+    def similarity(self):
+        if self._similarity is None:
+            self._similarity = semantic_similarity(self.answer, self.definition)
+        return self._similarity
+
+    @similarity.setter
+    def similarity(self, value):
+        self._similarity = value
 
     def __cmp__(self, other):
         return cmp((self.similarity, self.answer), (other.similarity, other.answer))
@@ -52,18 +84,115 @@ class PatternAnswer(AnnotatedAnswer):
     def long_derivation(self):
         return "I don't understand the wordplay for this clue, but {} matches '{}' with confidence score {:.1%}".format(self.answer.upper(), self.definition, self.similarity)
 
+class RenderedAnswer(AnnotatedAnswer):
+    """
+    An answer whose derivations have already been written out, as read
+    back by ClueSolutions.deserialize.
+    """
+    def __init__(self, ans, similarity, derivation, long_derivation):
+        self.answer = ans
+        self.similarity = similarity
+        self.definition = None
+        self.clue = None
+        self._derivation = derivation
+        self._long_derivation = long_derivation
+
+    def __str__(self):
+        return str([self.answer, self.similarity, self._derivation])
+
+    def derivation(self):
+        return self._derivation
+
+    def long_derivation(self):
+        return self._long_derivation
+
+
 class ClueSolutions:
+    """
+    Annotated answers grouped by answer. Each answer's score, the best
+    similarity among its entries, is only computed when the scores are
+    first asked for.
+    """
     def __init__(self, anns):
-        self.answer_scores = dict()
         self.answer_derivations = dict()
+        self._answer_scores = None
+        # False if solving was stopped before every parse was tried
+        self.complete = True
+        # the SolveStats report of the solve, with instrument=True
+        self.report = None
         for ann in anns:
-            self.answer_derivations.setdefault(ann.answer, []).append(ann)
-        for k, v in self.answer_derivations.items():
-            self.answer_scores[k] = max(a.similarity for a in v)
+            self.add(ann)
+
+    def add(self, ann):
+        self.answer_derivations.setdefault(ann.answer, []).append(ann)
+        self._answer_scores = None
+
+    @property
+    def answer_scores(self):
+        if self._answer_scores is None:
+            self._answer_scores = dict((answer, max(ann.similarity for ann in anns))
+                                       for answer, anns in self.answer_derivations.items())
+        return self._answer_scores
 
     def sorted_answers(self):
         return sorted([(v, k) for k, v in self.answer_scores.items()], reverse=True)
 
+    def serialize(self, max_derivations=5):
+        """
+        Write the solutions out as a JSON string, keeping the rendered
+        derivations of at most max_derivations entries per answer.
+        """
+        return json.dumps([[ann.answer, ann.similarity, ann.derivation(), ann.long_derivation()]
+                           for anns in self.answer_derivations.values()
+                           for ann in anns[:max_derivations]])
+
+    @staticmethod
+    def deserialize(data):
+        return ClueSolutions([RenderedAnswer(str(ans), sim, str(d), str(ld))
+                              for ans, sim, d, ld in json.loads(data)])
+
+
+class RankedAnswers(list):
+    """
+    The annotated answers returned by run(), best first, along with the
+    SolveStats report of the solve which found them, with
+    instrument=True (or None).
+    """
+    report = None
+
+
+def rank_answers(anns, top=None):
+    """
+    Sort annotated answers from best to worst. If top is given, only
+    return the entries for the best top distinct answers, and avoid
+    computing WordNet similarities for entries which cannot be among
+    them: once at least top distinct answers are known to score 1 by
+    the cheap synonym check, any entry whose answer sorts below all of
+    them can be dropped unscored, since it can at best tie on score and
+    then loses on the answer.
+    """
+    if top is None:
+        return sorted(anns, reverse=True)
+    exact = dict()
+    for ann in anns:
+        key = (ann.answer, ann.definition)
+        if key not in exact:
+            exact[key] = fast_semantic_similarity(*key) == 1
+        if exact[key]:
+            ann.similarity = 1
+    exact_answers = sorted(set(answer for (answer, definition), is_exact in exact.items() if is_exact))
+    if len(exact_answers) >= top:
+        threshold = exact_answers[-top]
+        anns = [ann for ann in anns if ann.answer >= threshold]
+    ranked = sorted(anns, reverse=True)
+    best = set([])
+    for ann in ranked:
+        if ann.answer not in best:
+            if len(best) == top:
+                break
+            best.add(ann.answer)
+    return [ann for ann in ranked if ann.answer in best]
+
 
 def arg_filter(arg_set):
     if arg_set != [""]:
@@ -72,71 +201,558 @@ def arg_filter(arg_set):
 
 
 class CrypticClueSolver(object):
-    def __init__(self):
+    """
+    With workers=N, the phrasings of each clue are solved in a pool of N
+    processes. The pool is forked when the solver is entered, after the
+    data sets have been loaded, so the workers share that data
+    copy-on-write instead of loading their own.
+
+    With keep_candidates=N, the answers found for the last N clues are
+    kept, and a clue which is asked again with a narrower pattern (as
+    when crossing letters are filled in) is answered by filtering them
+    instead of being solved again.
+
+    With forest=True, all parses of a clue are solved at once over its
+    parse forest, rather than each parse as its own tree. This is faster,
+    and finds the same answers for the same definitions, so the ranking
+    of distinct answers is the same (see test/test_forest.py). It only
+    keeps one derivation of each answer per top-level alternative, where
+    solving each tree keeps one per parse, so there are fewer entries
+    per answer, and the derivation kept for an answer may differ.
+
+    With instrument=True, the answers returned by run() and solve()
+    carry the report of a SolveStats for their clue (see
+    utils/instrumentation.py), also kept as self.stats for the last
+    clue, and with profile=fname, each run() writes a cProfile dump to
+    fname.
+
+    Solving in the pool stops as soon as it is cancelled or its deadline
+    passes: no more phrasings are handed to the workers, and those they
+    are working on are interrupted, through a cancel flag in shared
+    memory.
+    """
+    def __init__(self, workers=None, keep_candidates=0, forest=False, instrument=False, profile=None):
         self.answers_with_clues = None
         self.clue_text = None
         self.quiet = False
+        self.pruned_by_depth = []
+        self.answer_cache = AnswerCache()
+        self.workers = workers
+        self.pool = None
+        self.cancel_slots = None
+        self.share_answer_cache = False
+        self._answer_cache_key = None
+        self.cancel = None
+        self.interrupted = False
+        self.solutions = None
+        self.candidates = LRUCache(keep_candidates) if keep_candidates else None
+        self.forest = forest
+        self.instrument = instrument
+        self.profile = profile
+        self.stats = None
 
     def __enter__(self):
         # self.start_go_server()
+        if self.workers and self.pool is None:
+            # only a pool needs its data up front, so that the workers
+            # forked from this process share it; without one (as for a
+            # single clue on the command line), each data set is still
+            # loaded the first time it is used
+            data_files.load_all()
+            self.cancel_slots = CancelSlots(MAX_POOL_SOLVES)
+            self.pool = multiprocessing.Pool(self.workers, init_worker, (self.cancel_slots.flags,))
         return self
 
     def __exit__(self, type, value, traceback):
         self.stop()
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
         # self.stop_go_server()
 
     def stop(self):
-        pass
+        """
+        Interrupt the clue currently being solved, if any, from this or
+        another thread. Whatever was found so far is kept.
+        """
+        if self.cancel is not None:
+            self.cancel.cancel()
 
     def setup(self, clue_text):
         self.clue_text = clue_text
 
-    def run(self):
+    def run(self, top=None):
+        """
+        Solve the clue and return its annotated answers from best to
+        worst, as RankedAnswers. If top is given, only the entries for the
+        best top distinct answers are ranked and returned; the full,
+        unranked list stays available as self.answers_with_clues.
+        """
         self.clue_text = self.clue_text.encode('ascii', 'ignore')
         constraints = parse_clue_text(self.clue_text)
-        return self.solve_all_phrasings(constraints)
+        answers = RankedAnswers(self.profiled(self.solve_all_phrasings, constraints, top))
+        if self.stats is not None:
+            answers.report = self.stats.report()
+        return answers
         # all_phrasings, lengths, pattern, answer = parse_clue_text(self.clue_text)
 
-    def solve_all_phrasings(self, constraints):
+    def profiled(self, f, *args):
+        """
+        Return f(*args), writing a cProfile dump of the call to
+        self.profile if it is set.
+        """
+        if self.profile is None:
+            return f(*args)
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(f, *args)
+        finally:
+            profiler.dump_stats(self.profile)
+
+    def iter_answers(self, deadline=None, cancel=None):
+        """
+        Solve the clue given to setup(), yielding each annotated answer as
+        soon as its parse has been solved. self.solutions holds the
+        best-so-far ranking (a ClueSolutions) and is updated before each
+        answer is yielded. Solving stops early, keeping what was found so
+        far, once the deadline (in time.time() seconds) has passed, when
+        the given CancelToken is cancelled, or when stop() is called.
+        With instrument=True, self.solutions.report is set once solving
+        stops.
+        """
+        self.clue_text = self.clue_text.encode('ascii', 'ignore')
+        constraints = parse_clue_text(self.clue_text)
+        if cancel is None:
+            cancel = CancelToken(deadline)
+        elif deadline is not None:
+            cancel.deadline = deadline
+        self.solutions = solutions = ClueSolutions([])
+        for ann in self.iter_all_phrasings(constraints, cancel):
+            solutions.add(ann)
+            yield ann
+        if self.stats is not None:
+            solutions.report = self.stats.report()
+
+    def solve(self, clue_text, top=None, deadline=None, cancel=None):
+        """
+        Solve a clue and return its ClueSolutions, on a copy of this
+        solver (see _clone_options), so that several threads may call it
+        at once on one solver. top, deadline and cancel work as for run()
+        and iter_answers(). With instrument=True, the solutions carry
+        their report, and self.stats is set to the SolveStats of the last
+        clue to finish.
+        """
+        solver = self._clone_options()
+        solver.quiet = True
+        if cancel is None:
+            cancel = CancelToken(deadline)
+        elif deadline is not None:
+            cancel.deadline = deadline
+        constraints = parse_clue_text(clue_text.encode('ascii', 'ignore'))
+        solutions = ClueSolutions(solver.profiled(solver.solve_all_phrasings, constraints, top, cancel))
+        solutions.complete = not solver.interrupted
+        if self.instrument:
+            self.stats = solver.stats
+            solutions.report = solver.stats.report()
+        return solutions
+
+    def _clone_options(self):
+        """
+        A new solver with this one's options, sharing its worker pool and
+        its kept candidates, but none of its per-clue state.
+        """
+        solver = CrypticClueSolver(self.workers, forest=self.forest, instrument=self.instrument,
+                                   profile=self.profile)
+        solver.quiet = self.quiet
+        solver.pool = self.pool
+        solver.cancel_slots = self.cancel_slots
+        solver.candidates = self.candidates
+        return solver
+
+    def solve_all_phrasings(self, constraints, top=None, cancel=None):
+        candidates = self.find_candidates(constraints)
+        if candidates is not None:
+            self.stats = SolveStats() if self.instrument else None
+            self.pruned_by_depth = []
+            self.interrupted = False
+            self.cancel = cancel if cancel is not None else CancelToken()
+            self.answers_with_clues = [ann for ann in candidates if matches_pattern(ann.answer, constraints.pattern, constraints.lengths)]
+        else:
+            for ann in self.iter_all_phrasings(constraints, cancel):
+                pass
+            self.keep_candidates(constraints)
+        if len(self.answers_with_clues) == 0 and constraints.pattern.replace('.', '') != "" and not self.cancel.stopped():
+            with timed_phase(self.stats, 'fallback'):
+                all_phrasings = phrasings(constraints.phrases)
+                self.answers_with_clues = [PatternAnswer(x, all_phrasings[0]) for x in SYNONYMS if matches_pattern(x, constraints.pattern, constraints.lengths)]
+        with timed_phase(self.stats, 'rank'):
+            return rank_answers(self.answers_with_clues, top)
+
+    def find_candidates(self, constraints):
+        """
+        Return the answers kept for an earlier solve of the same clue with
+        a pattern which constraints.pattern narrows, or None.
+        """
+        if self.candidates is None:
+            return None
+        for pattern, anns in self.candidates.get((tuple(constraints.phrases), constraints.lengths), []):
+            if narrows_pattern(constraints.pattern, pattern):
+                return anns
+        return None
+
+    def keep_candidates(self, constraints):
+        """
+        Keep the answers just found for constraints, unless solving was
+        cut short, replacing any kept for patterns which this one covers.
+        """
+        if self.candidates is None or self.interrupted:
+            return
+        key = (tuple(constraints.phrases), constraints.lengths)
+        kept = [(p, anns) for p, anns in self.candidates.get(key, [])
+                if not narrows_pattern(p, constraints.pattern)]
+        self.candidates.put(key, kept + [(constraints.pattern, self.answers_with_clues)])
+
+    def iter_all_phrasings(self, constraints, cancel=None):
+        """
+        Yield the annotated answers of every phrasing of the clue, also
+        collecting them in self.answers_with_clues, until they run out or
+        solving is cancelled. Counts go to this call's own SolveStats,
+        which is only installed while solving, not while the answers are
+        being yielded, so that other solves on this thread in between
+        are not counted.
+        """
         all_phrasings = phrasings(constraints.phrases)
 
+        self.stats = SolveStats() if self.instrument else None
         self.answers_with_clues = []
-
-        for p in all_phrasings:
-            constraints = constraints._replace(phrases=p)
-            # constraints = Constraints(p, lengths, pattern, answer)
-            if not self.quiet:
-                print p
-            for ann_ans in self.solve_constraints(constraints):
-                self.answers_with_clues.append(ann_ans)
-        if len(self.answers_with_clues) == 0 and constraints.pattern.replace('.', '') != "":
-            self.answers_with_clues = [PatternAnswer(x, all_phrasings[0]) for x in SYNONYMS if matches_pattern(x, constraints.pattern, constraints.lengths)]
-        self.answers_with_clues.sort(reverse=True)
-        return self.answers_with_clues
+        self.pruned_by_depth = []
+        self.interrupted = False
+        self.cancel = cancel if cancel is not None else CancelToken()
+        # subtree answers only depend on the lengths and pattern, so a
+        # batch of clues may keep sharing them until those change
+        cache_key = (constraints.lengths, constraints.pattern)
+        if not self.share_answer_cache:
+            self.answer_cache = AnswerCache()
+        elif cache_key != self._answer_cache_key or self.answer_cache.maxsize is None:
+            self.answer_cache = AnswerCache(SHARED_ANSWER_CACHE_SIZE)
+        self._answer_cache_key = cache_key
+
+        stats = self.stats
+        steps = self.solve_phrasings(constraints, all_phrasings)
+        try:
+            while True:
+                with collecting(stats), timed_phase(stats, 'solve'):
+                    answers = next(steps, None)
+                if answers is None:
+                    break
+                for ann_ans in answers:
+                    self.answers_with_clues.append(ann_ans)
+                    yield ann_ans
+        except SolveCancelled:
+            self.interrupted = True
+
+    def solve_many(self, clue_texts, top=None):
+        """
+        Solve a batch of clues, yielding (index, clue_text, answers,
+        seconds) for each one as it finishes, where index is its position
+        in clue_texts. Identical clues are only solved once. Clues are
+        grouped by lengths and pattern so that solved subtrees can be
+        shared between them, and are spread over the worker pool if
+        there is one. If top is given, only the entries for that many
+        distinct answers are kept for each clue.
+        """
+        groups = dict()
+        for i, clue_text in enumerate(clue_texts):
+            phrases, lengths, pattern, answer = split_clue_text(clue_text)
+            groups.setdefault((lengths, pattern, tuple(phrases)), []).append(i)
+        jobs = [(indices[0], clue_texts[indices[0]], top) for key, indices in sorted(groups.items())]
+        duplicates = dict((indices[0], indices) for indices in groups.values())
+
+        if self.pool is None:
+            results = (self.solve_clue_timed(*job) for job in jobs)
+        else:
+            results = self.pool.imap_unordered(solve_clue_in_worker, [job + (self.forest,) for job in jobs])
+        for i, answers, seconds in results:
+            for j in duplicates[i]:
+                yield j, clue_texts[j], answers, seconds
+
+    def solve_clue_timed(self, index, clue_text, top=None):
+        share_answer_cache = self.share_answer_cache
+        self.share_answer_cache = True
+        try:
+            start = time.time()
+            self.setup(clue_text)
+            answers = self.run(top)
+            seconds = time.time() - start
+        finally:
+            self.share_answer_cache = share_answer_cache
+        return index, answers, seconds
+
+    def solve_phrasings(self, constraints, all_phrasings):
+        """
+        Yield lists of answers for the phrasings in order: one list per
+        parse when solving here, or one per phrasing when solving in the
+        worker pool. Raises SolveCancelled if self.cancel is cancelled.
+        """
+        all_constraints = [constraints._replace(phrases=p) for p in all_phrasings]
+        if self.pool is None:
+            for c in all_constraints:
+                self.cancel.check()
+                if not self.quiet:
+                    print c.phrases
+                for answers in self.parse_answers(c):
+                    self.cancel.check()
+                    yield answers
+        else:
+            for answers in self.solve_phrasings_in_pool(all_constraints):
+                yield answers
+
+    def solve_phrasings_in_pool(self, all_constraints):
+        """
+        Hand the phrasings to the worker pool, keeping only as many of
+        them queued as there are workers, and yield their answers in
+        order. Once self.cancel is cancelled, the rest are dropped and
+        the workers are told to stop on the ones they have.
+        """
+        slot = self.cancel_slots.claim() if self.cancel_slots is not None else None
+        jobs = iter(all_constraints)
+        pending = deque()
+        try:
+            while True:
+                while len(pending) < (self.workers or 1) and not self.cancel.stopped():
+                    c = next(jobs, None)
+                    if c is None:
+                        break
+                    job = (c, self.forest, self.stats is not None, self.cancel.deadline, slot)
+                    pending.append((c, self.pool.apply_async(solve_constraints_in_worker, (job,))))
+                if not pending:
+                    # nothing was queued if it was cancelled before starting
+                    self.cancel.check()
+                    break
+                c, result = pending[0]
+                while not result.ready():
+                    self.cancel.check()
+                    result.wait(POLL_SECONDS)
+                pending.popleft()
+                answers, interrupted, pruned_by_depth, hits, misses, report = result.get()
+                if not self.quiet:
+                    print c.phrases
+                self.count_pruned(pruned_by_depth)
+                self.answer_cache.hits += hits
+                self.answer_cache.misses += misses
+                if report is not None:
+                    self.stats.merge(report)
+                yield answers
+                self.cancel.check()
+                if interrupted:
+                    raise SolveCancelled()
+        finally:
+            if slot is not None:
+                if pending:
+                    self.cancel_slots.cancel(slot)
+                self.cancel_slots.release(slot, [result for c, result in pending])
 
     def solve_constraints(self, constraints):
+        """
+        Return the annotated answers of a single phrasing, and whether
+        solving it was cut short by self.cancel.
+        """
         answers_with_clues = []
-        possible_clues = generate_clues(constraints)
-
-        for i, clue in enumerate(possible_clues):
-            # print "solving:", clue
-            try:
-                answers = clue.answers
-            except ClueUnsolvableError:
-                answers = []
-            for answer in answers:
-                answers_with_clues.append(AnnotatedAnswer(answer, clue))
-        return sorted(answers_with_clues, reverse=True)
+        try:
+            for answers in self.parse_answers(constraints):
+                # solve what the derivations need here, with the answer
+                # cache and self.cancel, before the trees leave the worker
+                for clue in dict((id(ann.clue), ann.clue) for ann in answers).values():
+                    clue.resolve()
+                answers_with_clues.extend(answers)
+        except SolveCancelled:
+            return answers_with_clues, True
+        return answers_with_clues, False
+
+    def parse_answers(self, constraints):
+        """
+        Yield lists of annotated answers for a single phrasing: one per
+        parse, or one per top-level alternative of the parse forest.
+        """
+        if self.forest:
+            for clues, pruned_by_depth in solve_clues(constraints, self.answer_cache, self.cancel):
+                self.count_pruned(pruned_by_depth)
+                yield [AnnotatedAnswer(clue.answers.keys()[0], clue) for clue in clues]
+        else:
+            for clue in generate_clues(constraints, self.answer_cache, self.cancel):
+                yield self.clue_answers(clue)
+
+    def clue_answers(self, clue):
+        try:
+            answers = clue.answers
+        except ClueUnsolvableError:
+            answers = []
+        self.count_pruned(clue.pruned_by_depth)
+        return [AnnotatedAnswer(answer, clue) for answer in answers]
+
+    def count_pruned(self, pruned_by_depth):
+        """
+        Add one parse's per-depth counts of rejected partial answers
+        (see ClueTree.make_top_arg_sets) to the running totals.
+        """
+        for depth, n in enumerate(pruned_by_depth):
+            if depth < len(self.pruned_by_depth):
+                self.pruned_by_depth[depth] += n
+            else:
+                self.pruned_by_depth.append(n)
+
+    @property
+    def answer_cache_stats(self):
+        """
+        Hits, misses and size of the subtree answer cache for the last clue.
+        """
+        return {'hits': self.answer_cache.hits,
+                'misses': self.answer_cache.misses,
+                'entries': len(self.answer_cache)}
+
+    @property
+    def similarity_cache_stats(self):
+        """
+        Sizes, hit rates and evictions of the WordNet similarity caches.
+        These are shared by every solver in the process.
+        """
+        return {'similarities': SIMILARITIES.stats(),
+                'synset_closures': SYNSET_CLOSURES.stats()}
 
     def collect_answers(self):
         if self.answers_with_clues is not None:
             return ClueSolutions(self.answers_with_clues)
 
 
+class CancelSlots(object):
+    """
+    Cancel flags in shared memory, one for each solve running in a
+    worker pool, which the workers check as they go (see
+    WorkerCancelToken). The flags must be made before the pool is
+    forked. A released slot is only handed out again once the jobs of
+    the solve which held it have finished.
+    """
+    def __init__(self, size):
+        self.flags = multiprocessing.RawArray('b', size)
+        self._free = range(size)
+        self._released = []
+        self._lock = threading.Lock()
+
+    def claim(self):
+        """
+        Return a free slot with its flag cleared, or None if there are
+        none, in which case the workers can only stop at the deadline.
+        """
+        with self._lock:
+            released = []
+            for slot, results in self._released:
+                if all(r.ready() for r in results):
+                    self._free.append(slot)
+                else:
+                    released.append((slot, results))
+            self._released = released
+            if not self._free:
+                return None
+            slot = self._free.pop()
+            self.flags[slot] = 0
+            return slot
+
+    def cancel(self, slot):
+        self.flags[slot] = 1
+
+    def release(self, slot, results):
+        """
+        Give up a slot, whose solve may still have jobs, with the given
+        AsyncResults, running in the pool.
+        """
+        with self._lock:
+            self._released.append((slot, results))
+
+
+_cancel_flags = None
+
+
+def init_worker(cancel_flags):
+    global _cancel_flags
+    _cancel_flags = cancel_flags
+
+
+class WorkerCancelToken(CancelToken):
+    """
+    A CancelToken in a pool worker, which is also stopped once the
+    parent solver sets the cancel flag in the given slot.
+    """
+    def __init__(self, deadline=None, slot=None):
+        super(WorkerCancelToken, self).__init__(deadline)
+        self.slot = slot
+
+    def stopped(self):
+        if self.slot is not None and _cancel_flags is not None and _cancel_flags[self.slot]:
+            return True
+        return super(WorkerCancelToken, self).stopped()
+
+
+def solve_constraints_in_worker(job):
+    """
+    Solve a single phrasing in a pool worker, returning its answers,
+    whether it was cut short, and the statistics the parent solver
+    keeps.
+    """
+    constraints, forest, instrument, deadline, slot = job
+    solver = CrypticClueSolver(forest=forest)
+    solver.cancel = WorkerCancelToken(deadline, slot)
+    if instrument:
+        stats = SolveStats()
+        with collecting(stats):
+            answers, interrupted = solver.solve_constraints(constraints)
+        report = stats.report()
+    else:
+        answers, interrupted = solver.solve_constraints(constraints)
+        report = None
+    return answers, interrupted, solver.pruned_by_depth, solver.answer_cache.hits, solver.answer_cache.misses, report
+
+
+_worker_solver = None
+
+
+def solve_clue_in_worker(job):
+    """
+    Solve a whole clue for CrypticClueSolver.solve_many in a pool worker.
+    Each worker keeps one solver for the whole batch, so it can reuse
+    solved subtrees between consecutive clues.
+    """
+    global _worker_solver
+    index, clue_text, top, forest = job
+    if _worker_solver is None:
+        _worker_solver = CrypticClueSolver()
+        _worker_solver.quiet = True
+    _worker_solver.forest = forest
+    index, answers, seconds = _worker_solver.solve_clue_timed(index, clue_text, top)
+    for ann in answers:
+        if isinstance(ann.clue, ClueTree):
+            ann.clue.resolve()
+    return index, answers, seconds
+
+
 def matches_pattern(word, pattern, lengths):
+    if pattern == '':
+        return tuple(len(x) for x in word.split('_')) == lengths
     return (tuple(len(x) for x in word.split('_')) == lengths) and all(c == pattern[i] or pattern[i] == '.' for i, c in enumerate(word.replace('_', '')))
 
 
+def narrows_pattern(pattern, broader):
+    """
+    True if every answer matching pattern also matches broader, where an
+    empty pattern allows any letters.
+    """
+    if broader.replace('.', '') == '':
+        return True
+    if len(pattern) != len(broader):
+        return False
+    return all(b == '.' or b == p for p, b in zip(pattern, broader))
+
+
 def split_clue_text(clue_text):
     clue_text = clue_text.encode('ascii', 'ignore')
     if '|' not in clue_text:
@@ -0,0 +1,255 @@
+"""
+Fill in a whole .puz grid without help: solve every clue to a list of
+candidate answers, prune the candidates which cannot agree with any
+candidate of a crossing clue, and search for the fill which best trades
+off the answers' similarity scores against agreement at crossings. Clues
+left without an answer are solved again with the crossing letters as
+their pattern, until no pattern changes.
+
+    python pycryptics/solve_grid.py sample_puzzles/kegler_cryptic_1.puz -w 4
+
+writes sample_puzzles/kegler_cryptic_1.solved.puz, and one JSON object
+per clue with its answer and confidence to the output.
+"""
+from __future__ import division
+import pycryptics.puzpy.puz as puz
+from pycryptics.solve_clue import CrypticClueSolver
+import argparse
+import heapq
+import json
+import os
+import sys
+import time
+
+# Score for each crossing where two chosen answers agree, on the same
+# scale as the answers' similarities (0 to 1)
+CROSSING_WEIGHT = 0.5
+# Search nodes expanded before the best partial fill is completed greedily
+MAX_EXPANSIONS = 20000
+# Rounds of re-solving clues with the letters of their crossing answers
+MAX_ROUNDS = 3
+
+
+def clue_id(clue):
+    return str(clue['num']) + clue['dir']
+
+
+def candidate_scores(answers):
+    """
+    Map each distinct answer, as grid letters, to its best similarity.
+    """
+    scores = dict()
+    for ann in answers:
+        letters = ann.answer.replace('_', '').upper()
+        scores[letters] = max(ann.similarity, scores.get(letters, 0))
+    return scores
+
+
+def grid_crossings(p, clues):
+    """
+    Return a list of (id_a, i, id_b, j) for each cell where the i'th
+    letter of clue id_a is the j'th letter of clue id_b.
+    """
+    cells = dict()
+    for clue in clues:
+        for i, cell in enumerate(p.occupied_squares(clue)):
+            cells.setdefault(cell, []).append((clue_id(clue), i))
+    return [(a, i, b, j) for entries in cells.values() if len(entries) == 2
+            for (a, i), (b, j) in [entries]]
+
+
+def arc_consistency(domains, crossings):
+    """
+    Remove, in place, every candidate of a clue whose letter at some
+    crossing matches no candidate of the crossing clue. Clues with no
+    candidates constrain nothing, and a crossing which would remove all
+    of a clue's candidates is ignored, leaving them all in place rather
+    than emptying the grid, since the crossing clue's real answer may
+    simply not have been found.
+    """
+    arcs = dict()
+    for a, i, b, j in crossings:
+        arcs.setdefault(a, []).append((i, b, j))
+        arcs.setdefault(b, []).append((j, a, i))
+    queue = list(domains.keys())
+    queued = set(queue)
+    while queue:
+        b = queue.pop()
+        queued.discard(b)
+        if not domains.get(b):
+            continue
+        for j, a, i in arcs.get(b, []):
+            if not domains.get(a):
+                continue
+            letters = set(ans[j] for ans in domains[b])
+            kept = dict((ans, s) for ans, s in domains[a].items() if ans[i] in letters)
+            if len(kept) == len(domains[a]) or len(kept) == 0:
+                continue
+            domains[a] = kept
+            if a not in queued:
+                queue.append(a)
+                queued.add(a)
+    return domains
+
+
+def best_fill(domains, crossings, fixed=None, crossing_weight=CROSSING_WEIGHT, max_expansions=MAX_EXPANSIONS):
+    """
+    Best-first search for the choice of at most one candidate per clue
+    which maximizes the sum of their similarities plus crossing_weight
+    for each crossing where two chosen answers agree. Chosen answers must
+    agree with each other and with the letters in fixed, a dict of
+    (clue id, position) -> letter. Clues may be left unanswered. Returns
+    a dict of clue id -> answer (or None).
+    """
+    fixed_letters = dict()
+    for (c, i), letter in (fixed or dict()).items():
+        fixed_letters.setdefault(c, []).append((i, letter))
+    order = sorted((c for c in domains if domains[c]), key=lambda c: (len(domains[c]), c))
+    position = dict((c, k) for k, c in enumerate(order))
+    # crossings with clues earlier in the order, which are scored when
+    # the later of the two clues is chosen
+    earlier = dict((c, []) for c in order)
+    for a, i, b, j in crossings:
+        if a in position and b in position:
+            if position[a] < position[b]:
+                earlier[b].append((j, a, i))
+            else:
+                earlier[a].append((i, b, j))
+    options = [sorted(domains[c].items(), key=lambda x: (-x[1], x[0])) + [(None, 0)] for c in order]
+    bound = [0] * (len(order) + 1)
+    for k in range(len(order) - 1, -1, -1):
+        bound[k] = bound[k + 1] + options[k][0][1] + crossing_weight * len(earlier[order[k]])
+
+    def extensions(chosen):
+        k = len(chosen)
+        c = order[k]
+        for ans, sim in options[k]:
+            score = sim
+            if ans is not None:
+                if any(ans[i] != letter for i, letter in fixed_letters.get(c, [])):
+                    continue
+                ok = True
+                for i, other, j in earlier[c]:
+                    other_ans = chosen[position[other]]
+                    if other_ans is None:
+                        continue
+                    if other_ans[j] != ans[i]:
+                        ok = False
+                        break
+                    score += crossing_weight
+                if not ok:
+                    continue
+            yield ans, score
+
+    heap = [(-bound[0], 0, (), 0)]
+    counter = 1
+    best = ((), 0)
+    expansions = 0
+    while heap:
+        priority, _, chosen, score = heapq.heappop(heap)
+        if len(chosen) == len(order):
+            best = (chosen, score)
+            break
+        if (len(chosen), score) > (len(best[0]), best[1]):
+            best = (chosen, score)
+        expansions += 1
+        if expansions > max_expansions:
+            break
+        for ans, gained in extensions(chosen):
+            heapq.heappush(heap, (-(score + gained + bound[len(chosen) + 1]), counter, chosen + (ans,), score + gained))
+            counter += 1
+
+    chosen = best[0]
+    while len(chosen) < len(order):
+        # out of search budget: finish off greedily
+        ans, gained = next(extensions(chosen))
+        chosen = chosen + (ans,)
+    fill = dict((c, None) for c in domains)
+    fill.update(zip(order, chosen))
+    return fill
+
+
+def confidence(domain, answer):
+    """
+    The answer's similarity, scaled by its share of the total similarity
+    of the candidates left for its clue.
+    """
+    total = sum(domain.values())
+    if answer is None or total == 0:
+        return 0
+    return domain[answer] * domain[answer] / total
+
+
+class GridSolver(object):
+    def __init__(self, solver, top=15):
+        self.solver = solver
+        self.top = top
+
+    def solve(self, p):
+        """
+        Fill in as much of the puzzle's grid as possible. Returns a dict
+        of clue id -> (answer, confidence) for every clue.
+        """
+        numbering = p.clue_numbering()
+        clues = numbering.across + numbering.down
+        by_id = dict((clue_id(c), c) for c in clues)
+        crossings = grid_crossings(p, clues)
+        original = list(p.grid)
+        candidates = dict()
+        solved_patterns = dict()
+        to_solve = clues
+        for _ in range(MAX_ROUNDS):
+            texts = [p.encode_clue_for_solver(c) for c in to_solve]
+            for index, text, answers, seconds in self.solver.solve_many(texts, top=self.top):
+                c = to_solve[index]
+                candidates[clue_id(c)] = candidate_scores(answers)
+                solved_patterns[clue_id(c)] = p.get_clue_fill(c)
+
+            domains = arc_consistency(dict((c, dict(s)) for c, s in candidates.items()), crossings)
+            fixed = dict(((clue_id(c), i), original[cell]) for c in clues
+                         for i, cell in enumerate(p.occupied_squares(c))
+                         if original[cell] != '-')
+            fill = best_fill(domains, crossings, fixed)
+
+            p.grid = list(original)
+            for c, ans in fill.items():
+                if ans is not None:
+                    p.set_clue_fill(by_id[c], ans)
+            to_solve = [c for c in clues if fill[clue_id(c)] is None and
+                        p.get_clue_fill(c) != solved_patterns[clue_id(c)]]
+            if not to_solve:
+                break
+        return dict((c, (fill[c], confidence(domains[c], fill[c]))) for c in by_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill in whole cryptic crossword grids")
+    parser.add_argument('puz_files', nargs='+', help=".puz files to fill in")
+    parser.add_argument('-o', '--output', help="JSON-lines output file for per-clue answers (default: stdout)")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="number of worker processes")
+    parser.add_argument('-n', '--top', type=int, default=15, help="number of candidate answers per clue")
+    args = parser.parse_args()
+
+    out = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        with CrypticClueSolver(workers=args.workers) as solver:
+            solver.quiet = True
+            grid_solver = GridSolver(solver, args.top)
+            for fname in args.puz_files:
+                start = time.time()
+                p = puz.read(fname)
+                results = grid_solver.solve(p)
+                solved_fname = os.path.splitext(fname)[0] + '.solved.puz'
+                p.save(solved_fname)
+                for c, (answer, conf) in sorted(results.items()):
+                    out.write(json.dumps({'puzzle': fname, 'clue': c, 'answer': answer,
+                                          'confidence': round(conf, 3)}) + '\n')
+                out.flush()
+                sys.stderr.write("Filled {} in {:.1f} seconds\n".format(solved_fname, time.time() - start))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -11,7 +11,7 @@ def rlinput(prompt, prefill=''):
     finally:
         readline.set_startup_hook()
 
-with CrypticClueSolver() as solver:
+with CrypticClueSolver(keep_candidates=100) as solver:
     fname = sys.argv[1]
     p = puz.read(fname)
 
@@ -31,7 +31,7 @@ with CrypticClueSolver() as solver:
                     if action == "s":
                         solver.setup(p.encode_clue_for_solver(clue))
                         try:
-                            answers = solver.run()
+                            answers = solver.run(top=15)
                             ans_strings = dict()
                             ans_derivations = dict()
                             ndx = 0
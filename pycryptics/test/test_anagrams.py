@@ -0,0 +1,22 @@
+import unittest
+import random
+from pycryptics.solve_clue import Constraints
+from pycryptics.utils.synonyms import SYNONYMS
+from pycryptics.utils.transforms import split_words, matches_pattern
+from pycryptics.utils.clue_funcs import indexed_word_anagrams, ngram_anagrams
+
+
+class TestIndexedAnagrams(unittest.TestCase):
+    def test_same_as_ngram_search(self):
+        rng = random.Random(0)
+        entries = sorted(w for w in SYNONYMS if '_' in w and len(w) <= 12 and all(w.split('_')))
+        for entry in rng.sample(entries, min(len(entries), 100)):
+            lengths = tuple(len(x) for x in entry.split('_'))
+            letters = list(entry.replace('_', ''))
+            rng.shuffle(letters)
+            word = ''.join(letters)
+            pattern = '' if rng.random() < 0.7 else entry.replace('_', '')[0] + '.' * (len(word) - 1)
+            constraints = Constraints(phrases=[], lengths=lengths, pattern=pattern, known_answer='')
+            expected = set(a for a in ngram_anagrams(word, constraints) or []
+                           if '_'.join(split_words(a, lengths)) in SYNONYMS and matches_pattern(a, pattern))
+            self.assertEqual(set(indexed_word_anagrams(word, constraints) or []), expected, entry)
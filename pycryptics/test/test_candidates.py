@@ -0,0 +1,51 @@
+import unittest
+from pycryptics.solve_clue import CrypticClueSolver, narrows_pattern
+
+
+class TestNarrowsPattern(unittest.TestCase):
+    def test_narrows_pattern(self):
+        self.assertTrue(narrows_pattern('i....', ''))
+        self.assertTrue(narrows_pattern('i....', '.....'))
+        self.assertTrue(narrows_pattern('i...t', 'i....'))
+        self.assertTrue(narrows_pattern('i....', 'i....'))
+        self.assertFalse(narrows_pattern('i....', 'i...t'))
+        self.assertFalse(narrows_pattern('', 'i....'))
+        self.assertFalse(narrows_pattern('a....', 'i....'))
+        self.assertFalse(narrows_pattern('i...', 'i....'))
+
+
+class TestKeptCandidates(unittest.TestCase):
+    def solve(self, solver, clue_text):
+        solver.setup(clue_text)
+        return sorted(set(ann.answer for ann in solver.run()))
+
+    def test_narrower_patterns_reuse_candidates(self):
+        solver = CrypticClueSolver(keep_candidates=2)
+        solver.quiet = True
+        solves = []
+        solve_phrasings = solver.solve_phrasings
+
+        def counted_solve_phrasings(*args):
+            solves.append(args)
+            return solve_phrasings(*args)
+        solver.solve_phrasings = counted_solve_phrasings
+
+        answers = self.solve(solver, "Unsuitable paint smeared (5)")
+        self.assertIn('inapt', answers)
+        self.assertEqual(len(solves), 1)
+        # narrower patterns are answered from the kept candidates
+        self.assertEqual(self.solve(solver, "Unsuitable paint smeared (5) i...."),
+                         [a for a in answers if a.startswith('i')])
+        self.assertEqual(self.solve(solver, "Unsuitable paint smeared (5) i...t"),
+                         [a for a in answers if a.startswith('i') and a.endswith('t')])
+        self.assertEqual(len(solves), 1)
+        # a different clue, lengths or pattern is solved again
+        self.solve(solver, "Unsuitable paint smeared (2,3)")
+        self.assertEqual(len(solves), 2)
+        self.solve(solver, "Unsuitable paint spilled (5) i....")
+        self.assertEqual(len(solves), 3)
+        # a wider pattern than one kept is solved again, and then kept
+        self.solve(solver, "Unsuitable paint spilled (5)")
+        self.assertEqual(len(solves), 4)
+        self.solve(solver, "Unsuitable paint spilled (5) .n...")
+        self.assertEqual(len(solves), 4)
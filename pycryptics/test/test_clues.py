@@ -1,6 +1,22 @@
 import unittest
+import pickle
 import time
 from pycryptics.solve_clue import CrypticClueSolver, split_clue_text
+from pycryptics.grammar.clue_tree import ClueTree
+from pycryptics.utils import data_files
+
+
+def subtrees(tree):
+    yield tree
+    for child in tree:
+        if isinstance(child, ClueTree):
+            for t in subtrees(child):
+                yield t
+
+
+def report_counts(report):
+    return (report['bigram_filter'], report['insertions'], report['total_parses'],
+            dict((name, r['calls']) for name, r in report['rules'].items()))
 
 
 class TestClues(unittest.TestCase):
@@ -34,3 +50,66 @@ class TestClues(unittest.TestCase):
                 # for a in answers[:5]:
                 #     print a
                 self.assertEqual(answers[0].answer.lower(), known_answer.lower().strip())
+
+    def test_pool_deadline(self):
+        with CrypticClueSolver(workers=2) as solver:
+            solver.quiet = True
+            solver.setup("Disreputable woman starting to snarl the last mentioned name (8)")
+            for ann in solver.iter_answers(deadline=time.time() - 1):
+                pass
+            self.assertTrue(solver.interrupted)
+            # the pool is left free to solve the next clue in full
+            solutions = solver.solve("Unsuitable paint smeared (5)")
+            self.assertTrue(solutions.complete)
+            self.assertEqual(solutions.sorted_answers()[0][1], 'inapt')
+
+    def test_pool_expired_deadline(self):
+        with CrypticClueSolver(workers=2) as solver:
+            solutions = solver.solve("Unsuitable paint smeared (5)", deadline=time.time() - 1)
+            self.assertFalse(solutions.complete)
+
+    def test_data_preloaded_only_for_pool(self):
+        preloads = []
+        load_all = data_files.load_all
+        data_files.load_all = lambda: preloads.append(True)
+        try:
+            with CrypticClueSolver():
+                pass
+            self.assertEqual(preloads, [])
+            with CrypticClueSolver(workers=1):
+                pass
+            self.assertEqual(preloads, [True])
+        finally:
+            data_files.load_all = load_all
+
+    def test_interleaved_reports(self):
+        clues = ["Unsuitable paint smeared (5)", "Initial meetings disappoint Rosemary internally (6)"]
+        expected = []
+        for clue_text in clues:
+            solver = CrypticClueSolver(instrument=True)
+            solver.quiet = True
+            solver.setup(clue_text)
+            expected.append(report_counts(solver.run().report))
+        solvers = []
+        for clue_text in clues:
+            solver = CrypticClueSolver(instrument=True)
+            solver.quiet = True
+            solver.setup(clue_text)
+            solvers.append(solver)
+        generators = [s.iter_answers() for s in solvers]
+        while generators:
+            for g in list(generators):
+                if next(g, None) is None:
+                    generators.remove(g)
+        self.assertEqual([report_counts(s.solutions.report) for s in solvers], expected)
+
+    def test_resolved_trees_pickle_solved(self):
+        solver = CrypticClueSolver()
+        solver.quiet = True
+        solver.setup("Initial meetings disappoint Rosemary internally (6)")
+        solver.run()
+        for ann in solver.answers_with_clues:
+            ann.clue.resolve()
+            clue = pickle.loads(pickle.dumps(ann.clue))
+            self.assertTrue(all(t._answers is not None for t in subtrees(clue)))
+            self.assertEqual(clue.derivation(ann.answer), ann.clue.derivation(ann.answer))
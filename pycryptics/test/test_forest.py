@@ -0,0 +1,44 @@
+import unittest
+import nltk
+from pycryptics.grammar.cfg import generate_grammar
+from pycryptics.grammar.clue_parse import parse_forest
+from pycryptics.solve_clue import CrypticClueSolver, PatternAnswer, split_clue_text
+from pycryptics.utils.phrasings import phrasings
+
+
+# The Earley parser and MemoChart, which the forests are checked
+# against, use the nltk 2 API (see requirements.txt)
+@unittest.skipIf(int(nltk.__version__.split('.')[0]) >= 3, "the Earley parser oracle needs nltk < 3.0")
+class TestParseForest(unittest.TestCase):
+    def test_same_parses_as_earley(self):
+        from nltk import parse
+        from pycryptics.grammar.memo_chart import MemoChart
+        for clue_text in open('clues/known_clues.txt', 'r').readlines():
+            phrases, lengths, pattern, answer = split_clue_text(clue_text)
+            for p in phrasings(phrases):
+                parser = parse.EarleyChartParser(generate_grammar(p), chart_class=MemoChart)
+                expected = sorted(str(t) for t in parser.nbest_parse(p))
+                self.assertEqual(sorted(str(t) for t in parse_forest(p).trees(p)), expected)
+
+
+def distinct_answers(anns):
+    answers = []
+    for ann in anns:
+        if ann.answer not in answers:
+            answers.append(ann.answer)
+    return answers
+
+
+class TestForestSolving(unittest.TestCase):
+    def test_same_answers_as_trees(self):
+        for clue_text in open('clues/known_clues.txt', 'r').readlines():
+            results = []
+            for forest in [False, True]:
+                solver = CrypticClueSolver(forest=forest)
+                solver.quiet = True
+                solver.setup(clue_text)
+                ranked = solver.run(top=10)
+                results.append((set((ann.answer, ann.definition) for ann in solver.answers_with_clues
+                                    if not isinstance(ann, PatternAnswer)),
+                                distinct_answers(ranked)))
+            self.assertEqual(results[0], results[1], clue_text)
@@ -0,0 +1,28 @@
+import unittest
+from pycryptics.utils.indicators import INDICATORS, IndicatorMatcher
+
+
+def slow_kinds(indicators, p):
+    return set(kind for kind, words in indicators.items()
+               if any(w == p or (len(w) > 5 and abs(len(w) - len(p)) <= 3 and p.startswith(w[:-3])) for w in words))
+
+
+class TestIndicatorMatcher(unittest.TestCase):
+    def test_small(self):
+        matcher = IndicatorMatcher({'ana_': ['broken', 'mad'], 'rev_': ['returning']})
+        self.assertEqual(matcher.kinds('mad'), set(['ana_']))
+        self.assertEqual(matcher.kinds('madly'), set([]))
+        self.assertEqual(matcher.kinds('bro'), set(['ana_']))
+        self.assertEqual(matcher.kinds('broadside'), set(['ana_']))
+        self.assertEqual(matcher.kinds('broadsides'), set([]))
+        self.assertEqual(matcher.kinds('returns'), set(['rev_']))
+
+    def test_same_as_indicator_lists(self):
+        indicators = INDICATORS.value()
+        matcher = IndicatorMatcher(indicators)
+        phrases = set([])
+        for words in indicators.values():
+            for w in words:
+                phrases.update([w, w[:-1], w[:-3], w[:-4], w + 's', w + 'ing', w + 'ings'])
+        for p in phrases:
+            self.assertEqual(matcher.kinds(p), slow_kinds(indicators, p), p)
@@ -0,0 +1,32 @@
+import unittest
+import random
+from pycryptics.solve_clue import Constraints
+from pycryptics.utils.clue_funcs import bigram_filter, insertion_answers
+
+
+def pairwise_insertions(word1, word2, constraints):
+    """
+    The insertions of word1 into word2 and of word2 into word1, as
+    all_insertions made them one pair at a time.
+    """
+    if len(word1) + len(word2) > sum(constraints.lengths):
+        return []
+    results = set([])
+    for j in range(1, len(word2)):
+        results.add(word2[:j] + word1 + word2[j:])
+    for j in range(len(word1)):
+        results.add(word1[:j] + word2 + word1[j:])
+    return bigram_filter(results, constraints)
+
+
+class TestInsertionAnswers(unittest.TestCase):
+    def test_same_as_pairwise(self):
+        rng = random.Random(0)
+        for lengths in [(5,), (7,), (3, 4), (4, 2, 3)]:
+            constraints = Constraints(phrases=[], lengths=lengths, pattern='', known_answer='')
+            for trial in range(20):
+                words = [[''.join(rng.choice('aeinorst' + 'bcdlmpuy') for k in range(rng.randint(1, 6)))
+                          for n in range(rng.randint(1, 8))] for w in range(2)]
+                expected = set((ans, (w1, w2)) for w1 in words[0] for w2 in words[1]
+                               for ans in pairwise_insertions(w1, w2, constraints))
+                self.assertEqual(set(insertion_answers(words[0], words[1], constraints)), expected)
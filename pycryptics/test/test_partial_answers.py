@@ -0,0 +1,56 @@
+import unittest
+import random
+from pycryptics.solve_clue import Constraints
+from pycryptics.utils.synonyms import SYNONYMS
+from pycryptics.utils.transforms import split_words, matches_pattern, valid_partial_answer, \
+    start_partial_answer, extend_partial_answer
+
+
+def initial_ngrams():
+    """
+    The prefixes of the dictionary words of each length, which partial
+    answers used to be checked against.
+    """
+    prefixes = dict()
+    for word in SYNONYMS:
+        if '_' in word:
+            continue
+        for i in range(len(word) + 1):
+            prefixes.setdefault(len(word), set([])).add(word[:i])
+    return prefixes
+
+
+def slow_valid_partial_answer(ans, constraints, prefixes):
+    if len(ans) > sum(constraints.lengths) or not matches_pattern(ans, constraints.pattern):
+        return False
+    return all(word in prefixes[constraints.lengths[i]]
+               for i, word in enumerate(split_words(ans, constraints.lengths)))
+
+
+class TestPartialAnswers(unittest.TestCase):
+    def test_same_as_initial_ngrams(self):
+        rng = random.Random(0)
+        prefixes = initial_ngrams()
+        words = sorted(w for w in SYNONYMS if '_' not in w)
+        for lengths in [(4,), (5,), (3, 4), (2, 1, 4)]:
+            if not all(l in prefixes for l in lengths):
+                continue
+            target = sum(lengths)
+            for trial in range(500):
+                ans = ''.join(rng.choice(words) for k in range(3))[:rng.randint(0, target + 1)]
+                if rng.random() < 0.5 and ans:
+                    # change a letter, so that fewer of them are valid
+                    i = rng.randrange(len(ans))
+                    ans = ans[:i] + rng.choice('abcdeilnorstu') + ans[i + 1:]
+                pattern = ''.join(rng.choice('.....ae') for k in range(target)) if rng.random() < 0.3 else ''
+                constraints = Constraints(phrases=[], lengths=lengths, pattern=pattern, known_answer='')
+                expected = slow_valid_partial_answer(ans, constraints, prefixes)
+                self.assertEqual(valid_partial_answer(ans, constraints), expected, (ans, lengths, pattern))
+                # extending the state a piece at a time gives the same result
+                state = start_partial_answer(constraints)
+                i = 0
+                while state is not None and i < len(ans):
+                    j = rng.randint(i + 1, len(ans))
+                    state = extend_partial_answer(state, ans[i:j], constraints)
+                    i = j
+                self.assertEqual(len(ans) <= target and state is not None, expected, (ans, lengths, pattern))
@@ -0,0 +1,46 @@
+import unittest
+import random
+from pycryptics import solve_clue
+from pycryptics.solve_clue import AnnotatedAnswer, rank_answers
+
+
+class StubAnswer(AnnotatedAnswer):
+    def __init__(self, answer, definition, similarity):
+        self.answer = answer
+        self.definition = definition
+        self._similarity = similarity
+
+
+class TestRankAnswers(unittest.TestCase):
+    def setUp(self):
+        # exact synonyms are the pairs which score 1
+        self.scores = dict()
+        self.fast_semantic_similarity = solve_clue.fast_semantic_similarity
+        solve_clue.fast_semantic_similarity = lambda answer, definition: 1 if self.scores[answer, definition] == 1 else 0
+
+    def tearDown(self):
+        solve_clue.fast_semantic_similarity = self.fast_semantic_similarity
+
+    def stub_answers(self, rng, n):
+        anns = []
+        for i in range(n):
+            answer = rng.choice('abcdefghijklmnop') + rng.choice('abc')
+            definition = rng.choice(['def1', 'def2', 'def3'])
+            self.scores.setdefault((answer, definition), rng.choice([1, 1, 0.9, 0.5, 0.5, 0.1, 0]))
+            anns.append(StubAnswer(answer, definition, self.scores[answer, definition]))
+        return anns
+
+    def test_top_matches_full_sort(self):
+        rng = random.Random(0)
+        for trial in range(200):
+            self.scores.clear()
+            anns = self.stub_answers(rng, rng.randint(0, 60))
+            top = rng.randint(1, 12)
+            full = sorted(anns, reverse=True)
+            best = []
+            for ann in full:
+                if ann.answer not in best and len(best) < top:
+                    best.append(ann.answer)
+            expected = [(a.answer, a.definition, a.similarity) for a in full if a.answer in best]
+            ranked = rank_answers(list(anns), top)
+            self.assertEqual([(a.answer, a.definition, a.similarity) for a in ranked], expected)
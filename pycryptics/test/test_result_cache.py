@@ -0,0 +1,54 @@
+import unittest
+from pycryptics.crypticweb import result_cache
+from pycryptics.crypticweb.result_cache import ResultCache, LRUBackend, SQLiteBackend
+from pycryptics.crypticweb.solve_queue import SolveQueue
+from pycryptics.solve_clue import ClueSolutions, RenderedAnswer
+
+
+class StubClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+class StubSolver(object):
+    def __init__(self, complete):
+        self.complete = complete
+        self.solved = []
+
+    def solve(self, clue_text, top=None, deadline=None):
+        self.solved.append(clue_text)
+        solutions = ClueSolutions([RenderedAnswer('inapt', 1.0, 'derivation', 'long derivation')])
+        solutions.complete = self.complete
+        return solutions
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.clock = StubClock()
+        self.time = result_cache.time
+        result_cache.time = self.clock
+
+    def tearDown(self):
+        result_cache.time = self.time
+
+    def test_expiry(self):
+        for backend in [LRUBackend(10), SQLiteBackend(':memory:')]:
+            cache = ResultCache(backend, ttl=60)
+            cache.put("Unsuitable paint smeared (5)", StubSolver(True).solve("Unsuitable paint smeared (5)"))
+            self.clock.now += 59
+            self.assertEqual(cache.get("unsuitable  paint smeared (5)").sorted_answers(), [(1.0, 'inapt')])
+            self.clock.now += 2
+            self.assertIsNone(cache.get("Unsuitable paint smeared (5)"))
+
+    def test_incomplete_results_not_cached(self):
+        for complete in [False, True]:
+            cache = ResultCache(LRUBackend(10))
+            solver = StubSolver(complete)
+            queue = SolveQueue(solver, 1, 1, 30, cache)
+            for i in range(2):
+                self.assertEqual(queue.solve("Unsuitable paint smeared (5)").complete, complete)
+            self.assertEqual(len(solver.solved), 1 if complete else 2)
+            self.assertEqual(cache.get("Unsuitable paint smeared (5)") is not None, complete)
@@ -0,0 +1,84 @@
+import unittest
+import pycryptics.puzpy.puz as puz
+from pycryptics.solve_grid import grid_crossings, arc_consistency, best_fill
+
+
+# A 3x3 grid with no black squares:
+#
+#   1 2 3
+#   4 . .
+#   5 . .
+def grid_clues():
+    clues = []
+    for num, cell in [(1, 0), (4, 3), (5, 6)]:
+        clues.append({'num': num, 'dir': 'a', 'cell': cell, 'len': 3})
+    for num, cell in [(1, 0), (2, 1), (3, 2)]:
+        clues.append({'num': num, 'dir': 'd', 'cell': cell, 'len': 3})
+    return clues
+
+
+class TestGridCrossings(unittest.TestCase):
+    def test_grid_crossings(self):
+        p = puz.Puzzle()
+        p.width = 3
+        p.height = 3
+        crossings = grid_crossings(p, grid_clues())
+        self.assertEqual(len(crossings), 9)
+        found = set()
+        for a, i, b, j in crossings:
+            found.add(tuple(sorted([(a, i), (b, j)])))
+        self.assertIn((('1a', 0), ('1d', 0)), found)
+        self.assertIn((('2d', 1), ('4a', 1)), found)
+        self.assertIn((('3d', 2), ('5a', 2)), found)
+        self.assertIn((('1d', 2), ('5a', 0)), found)
+
+
+class TestArcConsistency(unittest.TestCase):
+    def test_removes_unsupported_candidates(self):
+        # 1a's first letter is 1d's first letter, and 1d's last is 5a's first
+        crossings = [('1a', 0, '1d', 0), ('1d', 2, '5a', 0)]
+        domains = {'1a': {'cat': 0.9, 'dog': 0.8},
+                   '1d': {'cab': 0.5, 'cot': 0.4, 'pit': 0.3},
+                   '5a': {'tea': 0.7}}
+        arc_consistency(domains, crossings)
+        self.assertEqual(domains['1a'], {'cat': 0.9})
+        self.assertEqual(domains['1d'], {'cot': 0.4})
+        self.assertEqual(domains['5a'], {'tea': 0.7})
+
+    def test_clues_without_candidates_constrain_nothing(self):
+        domains = {'1a': {'cat': 0.9, 'dog': 0.8}, '1d': {}}
+        arc_consistency(domains, [('1a', 0, '1d', 0)])
+        self.assertEqual(domains['1a'], {'cat': 0.9, 'dog': 0.8})
+
+    def test_keeps_candidates_rather_than_emptying(self):
+        domains = {'1a': {'cat': 0.9, 'cow': 0.8}, '1d': {'dot': 0.5}}
+        arc_consistency(domains, [('1a', 0, '1d', 0)])
+        self.assertEqual(domains['1a'], {'cat': 0.9, 'cow': 0.8})
+        self.assertEqual(domains['1d'], {'dot': 0.5})
+
+
+class TestBestFill(unittest.TestCase):
+    def test_crossings_outweigh_similarity(self):
+        crossings = [('1a', 0, '1d', 0)]
+        domains = {'1a': {'dog': 0.9, 'cat': 0.2}, '1d': {'cot': 0.2}, '4a': {}}
+        fill = best_fill(domains, crossings, crossing_weight=1)
+        self.assertEqual(fill, {'1a': 'cat', '1d': 'cot', '4a': None})
+        fill = best_fill(domains, crossings, crossing_weight=0)
+        self.assertEqual(fill, {'1a': 'dog', '1d': None, '4a': None})
+
+    def test_disagreeing_clues_left_unanswered(self):
+        crossings = [('1a', 0, '1d', 0)]
+        domains = {'1a': {'cat': 0.9}, '1d': {'dot': 0.5}}
+        self.assertEqual(best_fill(domains, crossings), {'1a': 'cat', '1d': None})
+
+    def test_fixed_letters(self):
+        domains = {'1a': {'cat': 0.9, 'dog': 0.8}}
+        self.assertEqual(best_fill(domains, [], fixed={('1a', 1): 'o'}), {'1a': 'dog'})
+
+    def test_greedy_fallback(self):
+        crossings = [('1a', 0, '1d', 0)]
+        domains = {'1a': {'cat': 0.9, 'dog': 0.85}, '1d': {'dig': 0.8, 'cot': 0.1}}
+        self.assertEqual(best_fill(domains, crossings), {'1a': 'dog', '1d': 'dig'})
+        # out of budget before expanding anything, each clue takes its
+        # best answer which agrees with those already chosen
+        self.assertEqual(best_fill(domains, crossings, max_expansions=0), {'1a': 'cat', '1d': 'cot'})
@@ -0,0 +1,56 @@
+import unittest
+import os
+import tempfile
+from pycryptics.utils.sorted_store import SortedStore, write_sorted_store
+
+
+class TestSortedStore(unittest.TestCase):
+    def test_round_trip(self):
+        table = {'naked': ['bare', 'nude'], 'a': ['one', 'an'], 'lee_shores': [], 'soda': ['pop']}
+        fd, fname = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            write_sorted_store(table, fname)
+            store = SortedStore(fname)
+            self.assertEqual(len(store), len(table))
+            self.assertEqual(list(store), sorted(table.keys()))
+            for k, v in table.items():
+                self.assertTrue(k in store)
+                self.assertEqual(store[k], tuple(v))
+            self.assertFalse('nak' in store)
+            self.assertFalse('zzz' in store)
+            self.assertEqual(store.get('zzz'), None)
+        finally:
+            os.remove(fname)
+
+    def test_length_index(self):
+        table = {'a': ['one', 'an', 'ace', 'single', 'i'], 'lee_shores': [], 'soda': ['pop']}
+        fd, fname = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            write_sorted_store(table, fname, length_index=True)
+            store = SortedStore(fname)
+            self.assertEqual(store['a'], ('i', 'an', 'ace', 'one', 'single'))
+            self.assertEqual(store['lee_shores'], ())
+            self.assertEqual(store.values_up_to('a', 0), ())
+            self.assertEqual(store.values_up_to('a', 3), ('i', 'an', 'ace', 'one'))
+            self.assertEqual(store.values_up_to('a', 5), ('i', 'an', 'ace', 'one'))
+            self.assertEqual(store.values_up_to('a', 6), store['a'])
+            self.assertEqual(store.values_up_to('lee_shores', 6), ())
+            self.assertEqual(store.values_up_to('zzz', 6), ())
+        finally:
+            os.remove(fname)
+
+    def test_lower(self):
+        table = {'a': ['One', 'an', 'ACE', 'i'], 'soda': ['pop']}
+        fd, fname = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            write_sorted_store(table, fname, length_index=True)
+            store = SortedStore(fname, lower=True)
+            self.assertEqual(store['a'], ('i', 'an', 'ace', 'one'))
+            self.assertEqual(store.values_up_to('a', 2), ('i', 'an'))
+            self.assertIs(store.values_up_to('a', 3), store.values_up_to('a', 3))
+            self.assertIs(store.values_up_to('a', 3)[2], intern('ace'))
+        finally:
+            os.remove(fname)
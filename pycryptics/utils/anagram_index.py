@@ -0,0 +1,28 @@
+from pycryptics.utils.data_files import register
+import msgpack
+
+
+def anagram_key(word):
+    """
+    The sorted letter multiset of a word or '_'-joined phrase, e.g.
+    'lee_shores' -> 'eeehlorss'. Every dictionary entry with the same
+    key is an anagram of every other.
+    """
+    return ''.join(sorted(word.lower().replace('_', '')))
+
+
+def load_anagrams(fname):
+    with open(fname, 'r') as f:
+        return msgpack.load(f, use_list=False)
+
+
+ANAGRAMS = register('anagrams', 'data/anagrams.msgpack', load_anagrams)
+
+
+def indexed_anagrams(word, lengths):
+    """
+    All dictionary entries which use exactly the letters of word and
+    which split into words of the given lengths.
+    """
+    return [a for a in ANAGRAMS.get(anagram_key(word), ())
+            if tuple(len(x) for x in a.split('_')) == lengths]
@@ -1,7 +1,9 @@
 from __future__ import division
 from pycryptics.utils.synonyms import SYNONYMS
-from pycryptics.utils.ngrams import NGRAMS
-from pycryptics.utils.transforms import split_words
+from pycryptics.utils.ngrams import NGRAMS, bigram_masks
+from pycryptics.utils.anagram_index import indexed_anagrams
+from pycryptics.utils.transforms import split_words, matches_pattern
+from pycryptics.utils.instrumentation import current_stats
 
 
 def reverse(s, constraints):
@@ -10,7 +12,7 @@ def reverse(s, constraints):
 
 def internal_substrings(words, constraints):
     assert len(words) == 1
-    word = words[0].lower().replace('_', "")
+    word = words[0].replace('_', "")
     length = sum(constraints.lengths)
     subs = set([])
     if len(word) <= 1:
@@ -34,23 +36,109 @@ def internal_substrings(words, constraints):
 
 def all_insertions(words, constraints):
     assert len(words) == 2
-    word1, word2 = [w.lower().replace('_', "") for w in words]
-    results = set([])
+    word1, word2 = [w.replace('_', "") for w in words]
     if len(word1) + len(word2) > sum(constraints.lengths):
         return None
-    for j in range(1, len(word2)):
-        results.add(word2[:j] + word1 + word2[j:])
-    word2, word1 = word1, word2
-    for j in range(len(word2)):
-        results.add(word2[:j] + word1 + word2[j:])
-    return bigram_filter(results, constraints)
+    answers = list(set(ans for ans, pair in insertion_answers([word1], [word2], constraints)))
+    count_insertions(1, len(answers))
+    return answers
+
+
+def count_insertions(pairs, kept):
+    stats = current_stats()
+    if stats is not None:
+        stats.count_insertions(pairs, kept)
+
+
+def bigram_violations(word, masks):
+    """
+    The cleaned-up word, its number of bigrams which are not in masks,
+    and for each position k whether the bigram ending there is one.
+    """
+    clean = word.replace('_', "")
+    bad = [0] + [0 if masks[ord(a)] >> ord(b) & 1 else 1 for a, b in zip(clean, clean[1:])]
+    return clean, sum(bad), bad
+
+
+def insertion_index(words, threshold, masks):
+    """
+    Index the words which could be inserted into another by their first
+    and last letters, each group sorted by length. Words with too many
+    bigram violations of their own are left out.
+    """
+    index = dict()
+    for w in words:
+        clean, violations, bad = bigram_violations(w, masks)
+        if clean and violations <= threshold:
+            index.setdefault((clean[0], clean[-1]), []).append((len(clean), violations, clean, w))
+    for group in index.values():
+        group.sort()
+    return index
+
+
+def insertion_answers(words1, words2, constraints):
+    """
+    Yield (answer, (word1, word2)) for each insertion of a word1 into a
+    word2 or of a word2 into a word1, as all_insertions makes them, which
+    passes bigram_filter. The bigram violations of an insertion are those
+    of the outer word, less the one broken up by the insertion, plus
+    those of the inner word and of the two junctions, so each word's own
+    violations are counted once, and the inner words are grouped by the
+    letters at the junctions. A string is only built for an insertion
+    which is short enough and has few enough violations.
+    """
+    length = sum(constraints.lengths)
+    threshold = len(constraints.lengths) - 1
+    masks = bigram_masks(constraints.lengths)
+    # word1s go inside word2s (not at either end), and word2s inside or
+    # in front of word1s
+    for inner, outer, first, swapped in [(words1, words2, 1, False), (words2, words1, 0, True)]:
+        index = insertion_index(inner, threshold, masks)
+        if not index:
+            continue
+        for o in outer:
+            clean, violations, bad = bigram_violations(o, masks)
+            if violations - 1 > threshold:
+                continue
+            room = length - len(clean)
+            for j in range(first, len(clean)):
+                base = violations - bad[j]
+                if base > threshold:
+                    continue
+                left = masks[ord(clean[j - 1])] if j > 0 else None
+                right = ord(clean[j])
+                for (f, l), group in index.items():
+                    cost = base
+                    if left is not None and not left >> ord(f) & 1:
+                        cost += 1
+                    if not masks[ord(l)] >> right & 1:
+                        cost += 1
+                    if cost > threshold:
+                        continue
+                    for n, v, inner_clean, w in group:
+                        if n > room:
+                            break
+                        if cost + v <= threshold:
+                            yield clean[:j] + inner_clean + clean[j:], (o, w) if swapped else (w, o)
 
 
 def anagrams(words, constraints):
     assert len(words) == 1
-    word = words[0].lower().replace('_', '')
+    word = words[0].replace('_', '')
     if len(word) > sum(constraints.lengths):
         return None
+    if len(word) == sum(constraints.lengths):
+        # the anagram is the whole answer, so it must be a dictionary entry
+        return indexed_word_anagrams(word, constraints)
+    return ngram_anagrams(word, constraints)
+
+
+def ngram_anagrams(word, constraints):
+    """
+    The arrangements of word's letters each of whose words (split by
+    constraints.lengths) is an n-gram of a dictionary word of its length,
+    found by adding one letter at a time.
+    """
     letter_count = dict()
     for c in word:
         if c in letter_count:
@@ -58,6 +146,7 @@ def anagrams(words, constraints):
         else:
             letter_count[c] = 1
 
+    ngrams = NGRAMS.value()
     active_set = {"": letter_count}
     for i in range(len(word)):
         new_active_set = dict()
@@ -68,7 +157,7 @@ def anagrams(words, constraints):
                 candidate = partial + l
                 valid = True
                 for j, w in enumerate(split_words(candidate, constraints.lengths)):
-                    if not w in NGRAMS[constraints.lengths[j]]:
+                    if not w in ngrams[constraints.lengths[j]]:
                         valid = False
                         break
                 if valid:
@@ -86,22 +175,34 @@ def anagrams(words, constraints):
     # return active_set
     return [a for a in active_set if a != word]
 
+
+def indexed_word_anagrams(word, constraints):
+    ngrams = NGRAMS.value()
+    results = []
+    for a in indexed_anagrams(word, constraints.lengths):
+        if all(w in ngrams[constraints.lengths[j]] for j, w in enumerate(a.split('_'))):
+            a = a.replace('_', '')
+            if a != word and matches_pattern(a, constraints.pattern):
+                results.append(a)
+    if len(results) == 0:
+        return None
+    return results
+
 def bigram_filter(answers, constraints):
     threshold = len(constraints.lengths) - 1  # allow violations across word boundaries
+    masks = bigram_masks(constraints.lengths)
 
     valid_answers = []
     for ans in answers:
         violations = 0
         for i in range(len(ans)-1):
-            ok = False
-            for l in constraints.lengths:
-                if ans[i:i+2] in NGRAMS[l]:
-                    ok = True
-                    break
-            if not ok:
+            if not masks[ord(ans[i])] >> ord(ans[i+1]) & 1:
                 violations += 1
         if violations <= threshold:
             valid_answers.append(ans)
+    stats = current_stats()
+    if stats is not None:
+        stats.count_bigram_filter(len(answers), len(valid_answers))
     return valid_answers
 
 if __name__ == '__main__':
@@ -0,0 +1,102 @@
+from collections import OrderedDict
+import threading
+import time
+import os
+
+"""
+The solver's data sets (synonyms, n-grams, anagrams, indicators,
+WordNet, and the precomputed caches) are registered here as LazyData,
+and each is only read the first time it is used, so importing the solver
+costs next to nothing until the first clue is solved.
+
+Paths are relative to the data root, which holds the data/ and
+indicators/ directories. It is $PYCRYPTICS_DATA_ROOT, or the current
+directory if that is not set, and can be changed with set_data_root()
+before anything has been loaded.
+"""
+
+DATA_ROOT = os.environ.get('PYCRYPTICS_DATA_ROOT', '.')
+
+# every LazyData by name, in the order they were registered
+REGISTRY = OrderedDict()
+
+
+def set_data_root(root):
+    global DATA_ROOT
+    DATA_ROOT = root
+
+
+def data_path(path):
+    return os.path.join(DATA_ROOT, path)
+
+
+class LazyData(object):
+    """
+    Stands in for the value of load(data_path(path)), loading it on
+    first use. Attribute lookups, indexing, iteration, len() and 'in'
+    are passed through to the value; hot loops should take value() once
+    instead. Safe to share between threads.
+    """
+    def __init__(self, name, path, load):
+        self._name = name
+        self._path = path
+        self._load = load
+        self._value = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self.seconds = None
+
+    def value(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    start = time.time()
+                    self._value = self._load(data_path(self._path))
+                    self.seconds = time.time() - start
+                    self._loaded = True
+        return self._value
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def __getattr__(self, attr):
+        return getattr(self.value(), attr)
+
+    def __getitem__(self, key):
+        return self.value()[key]
+
+    def __contains__(self, key):
+        return key in self.value()
+
+    def __iter__(self):
+        return iter(self.value())
+
+    def __len__(self):
+        return len(self.value())
+
+
+def register(name, path, load):
+    """
+    Register a data set which is loaded by calling load with the full
+    path to path (relative to the data root) the first time it is used.
+    """
+    data = LazyData(name, path, load)
+    REGISTRY[name] = data
+    return data
+
+
+def load_all():
+    """
+    Load every registered data set now, e.g. before forking worker
+    processes so that they share it instead of each loading their own.
+    """
+    for data in REGISTRY.values():
+        data.value()
+
+
+def load_timings():
+    """
+    Seconds taken to load each data set loaded so far, by name.
+    """
+    return OrderedDict((name, data.seconds) for name, data in REGISTRY.items() if data.loaded)
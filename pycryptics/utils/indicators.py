@@ -1,9 +1,57 @@
-import os
+from pycryptics.utils.data_files import register
 from collections import defaultdict
+import os
+
+
+def load_indicators(dirname):
+    indicators = defaultdict(lambda: [])
+    for kind in os.listdir(dirname):
+        indicators[kind] = [s.strip() for s in open(os.path.join(dirname, kind), 'r').readlines()]
+    return indicators
+
+
+INDICATORS = register('indicators', 'indicators/', load_indicators)
+
+
+class IndicatorMatcher(object):
+    """
+    Finds the kinds of indicator a phrase may be, where phrase p matches
+    indicator w if p == w, or if w is longer than 5 letters, p starts
+    with w[:-3] and p is at most 3 letters longer than w. Exact matches
+    are a single dict lookup. The stems w[:-3] are kept in a trie, each
+    of whose stem nodes maps kinds to the longest phrase they match, so
+    p is checked against every stem by walking its letters once.
+    """
+    STEM_END = None
+
+    def __init__(self, indicators):
+        self.exact = dict()
+        self.stems = dict()
+        for kind, words in indicators.items():
+            for w in words:
+                self.exact.setdefault(w, set([])).add(kind)
+                if len(w) > 5:
+                    node = self.stems
+                    for c in w[:-3]:
+                        node = node.setdefault(c, dict())
+                    max_lengths = node.setdefault(self.STEM_END, dict())
+                    max_lengths[kind] = max(len(w) + 3, max_lengths.get(kind, 0))
+
+    def kinds(self, p):
+        kinds = set(self.exact.get(p, ()))
+        node = self.stems
+        for c in p:
+            node = node.get(c)
+            if node is None:
+                break
+            for kind, max_length in node.get(self.STEM_END, dict()).items():
+                if len(p) <= max_length:
+                    kinds.add(kind)
+        return kinds
+
+
+def load_indicator_matcher(dirname):
+    return IndicatorMatcher(INDICATORS.value())
 
-INDICATORS = defaultdict(lambda: [])
 
-print "Loading indicators from file..."
-for kind in os.listdir('indicators/'):
-    INDICATORS[kind] = [s.strip() for s in open('indicators/' + kind, 'r').readlines()]
-print "...done."
+INDICATOR_MATCHER = register('indicator_matcher', 'indicators/', load_indicator_matcher)
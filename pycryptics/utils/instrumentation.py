@@ -0,0 +1,125 @@
+from contextlib import contextmanager
+import threading
+import time
+
+"""
+Optional counters and timers for a solve (see CrypticClueSolver's
+instrument option). Hot paths look up the SolveStats being collected on
+their thread with current_stats(), and do nothing more when it is None,
+so solving without instrumentation costs one lookup per call.
+"""
+
+_local = threading.local()
+
+
+def current_stats():
+    return getattr(_local, 'stats', None)
+
+
+@contextmanager
+def collecting(stats):
+    """
+    Collect counts from the hot paths on this thread into stats.
+    """
+    previous = current_stats()
+    _local.stats = stats
+    try:
+        yield stats
+    finally:
+        _local.stats = previous
+
+
+class SolveStats(object):
+    """
+    Where the time went in solving one clue: wall time per phase, calls
+    and time per node type's apply_rule, candidates before and after
+    bigram_filter, pairs of words tried for insertion and the insertions
+    kept, and the number of parses of each phrasing. Insertions are
+    checked against the bigrams without being built (see
+    clue_funcs.insertion_answers), so they are not counted as
+    bigram_filter candidates.
+    """
+    def __init__(self):
+        self.phase_seconds = dict()
+        self.rule_calls = dict()
+        self.rule_seconds = dict()
+        self.bigram_candidates = 0
+        self.bigram_kept = 0
+        self.insertion_pairs = 0
+        self.insertions_kept = 0
+        self.parses = []
+
+    @contextmanager
+    def phase(self, name):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.time() - start)
+
+    def add_phase(self, name, seconds):
+        self.phase_seconds[name] = self.phase_seconds.get(name, 0) + seconds
+
+    def apply_rule(self, node, args, constraints):
+        start = time.time()
+        answers = node.apply_rule(args, constraints)
+        self.rule_calls[node.name] = self.rule_calls.get(node.name, 0) + 1
+        self.rule_seconds[node.name] = self.rule_seconds.get(node.name, 0) + time.time() - start
+        return answers
+
+    def apply_rule_sets(self, node, child_answers, constraints):
+        start = time.time()
+        results = node.apply_rule_sets(child_answers, constraints)
+        self.rule_calls[node.name] = self.rule_calls.get(node.name, 0) + 1
+        self.rule_seconds[node.name] = self.rule_seconds.get(node.name, 0) + time.time() - start
+        return results
+
+    def count_bigram_filter(self, candidates, kept):
+        self.bigram_candidates += candidates
+        self.bigram_kept += kept
+
+    def count_insertions(self, pairs, kept):
+        self.insertion_pairs += pairs
+        self.insertions_kept += kept
+
+    def count_parses(self, phrases, n):
+        self.parses.append((' '.join(phrases), n))
+
+    def merge(self, report):
+        """
+        Add in the counts from another SolveStats' report(), e.g. one sent
+        back from a worker process.
+        """
+        for name, seconds in report['phases'].items():
+            self.add_phase(name, seconds)
+        for name, r in report['rules'].items():
+            self.rule_calls[name] = self.rule_calls.get(name, 0) + r['calls']
+            self.rule_seconds[name] = self.rule_seconds.get(name, 0) + r['seconds']
+        self.count_bigram_filter(report['bigram_filter']['candidates'], report['bigram_filter']['kept'])
+        self.count_insertions(report['insertions']['pairs'], report['insertions']['kept'])
+        self.parses.extend((p['phrasing'], p['parses']) for p in report['parses'])
+
+    def report(self):
+        """
+        The counts as a dict of plain lists, dicts and numbers, ready to
+        be written out as JSON. The 'solve' phase includes 'parse'.
+        """
+        return {'phases': dict(self.phase_seconds),
+                'rules': dict((name, {'calls': self.rule_calls[name], 'seconds': self.rule_seconds[name]})
+                              for name in self.rule_calls),
+                'bigram_filter': {'candidates': self.bigram_candidates, 'kept': self.bigram_kept},
+                'insertions': {'pairs': self.insertion_pairs, 'kept': self.insertions_kept},
+                'parses': [{'phrasing': p, 'parses': n} for p, n in self.parses],
+                'total_parses': sum(n for p, n in self.parses)}
+
+
+@contextmanager
+def timed_phase(stats, name):
+    """
+    stats.phase(name), or nothing if stats is None.
+    """
+    if stats is None:
+        yield
+    else:
+        with stats.phase(name):
+            yield
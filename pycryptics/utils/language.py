@@ -1,24 +1,78 @@
 from pycryptics.utils.synonyms import cached_synonyms
-from nltk.corpus import wordnet as wn
+from pycryptics.utils.lru import LRUCache
+from pycryptics.utils.data_files import register, data_path
+import msgpack
+import os
+
+SIMILARITIES_FILE = 'data/similarities.msgpack'
+
+# synsets of each word together with their similar_tos
+SYNSET_CLOSURES = LRUCache(20000)
+
+# best similarity score for each (answer, definition) pair
+SIMILARITIES = LRUCache(200000)
+
+
+def load_similarities(fname):
+    """
+    Seed SIMILARITIES from a precomputed table, if there is one. See
+    data_generators/generate_similarities.py.
+    """
+    if os.path.exists(fname):
+        with open(fname, 'rb') as f:
+            for (word1, word2), p in msgpack.load(f, use_list=False).items():
+                SIMILARITIES.put((word1, word2), p)
+    return SIMILARITIES
+
+
+SEEDED_SIMILARITIES = register('similarities', SIMILARITIES_FILE, load_similarities)
+
+
+def save_similarities(fname=None):
+    SEEDED_SIMILARITIES.value()
+    with open(fname or data_path(SIMILARITIES_FILE), 'wb') as f:
+        msgpack.dump(dict(SIMILARITIES.items()), f)
+
+
+def load_wordnet(path):
+    # nltk finds its corpora through NLTK_DATA rather than the data root
+    from nltk.corpus import wordnet
+    wordnet.synsets  # the corpus loads itself on first use
+    return wordnet
+
+
+wn = register('wordnet', 'nltk_data', load_wordnet)
+
+
+def synset_closure(word):
+    closure = SYNSET_CLOSURES.get(word)
+    if closure is None:
+        closure = set([])
+        for s in wn.synsets(word):
+            closure.add(s)
+            closure.update(s.similar_tos())
+        closure = frozenset(closure)
+        SYNSET_CLOSURES.put(word, closure)
+    return closure
 
 
 def semantic_similarity(word1, word2):
+    SEEDED_SIMILARITIES.value()
+    p = SIMILARITIES.get((word1, word2))
+    if p is None:
+        p = uncached_semantic_similarity(word1, word2)
+        SIMILARITIES.put((word1, word2), p)
+    return p
+
+
+def uncached_semantic_similarity(word1, word2):
     words1 = word1.split('_')
     words2 = word2.split('_')
     if fast_semantic_similarity(word1, word2) == 1:
         return 1
     max_p = 0
-    word1_sim = set([])
-    for s1 in wn.synsets(word1):
-        word1_sim.add(s1)
-        word1_sim.update(s1.similar_tos())
-        # for st1 in [s1] + s1.similar_tos():
-        #     word1_sim.append(st1)
-
-    word2_sim = set([])
-    for s2 in wn.synsets(word2):
-        word2_sim.add(s2)
-        word2_sim.update(s2.similar_tos())
+    word1_sim = synset_closure(word1)
+    word2_sim = synset_closure(word2)
 
     for st1 in word1_sim:
         for st2 in word2_sim:
@@ -0,0 +1,66 @@
+from collections import OrderedDict
+import threading
+
+
+class LRUCache(object):
+    """
+    A dict-like cache holding at most maxsize entries, evicting the least
+    recently used entry when it is full. Keeps hit, miss and eviction
+    counts so callers can tell whether it is big enough. Safe to share
+    between threads.
+    """
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self._entries[key] = value
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            if key in self._entries:
+                self._entries.pop(key)
+            elif len(self._entries) >= self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._entries[key] = value
+
+    def items(self):
+        with self._lock:
+            return self._entries.items()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def hit_rate(self):
+        if self.hits + self.misses == 0:
+            return None
+        return self.hits / float(self.hits + self.misses)
+
+    def stats(self):
+        return {'entries': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hit_rate}
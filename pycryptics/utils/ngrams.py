@@ -1,11 +1,85 @@
+from pycryptics.utils.data_files import register
 import msgpack
 
-with open('data/ngrams.msgpack', 'r') as f:
-    NGRAMS = msgpack.load(f, use_list=False)
-    for k in NGRAMS:
-        NGRAMS[k] = set(NGRAMS[k])
 
-with open('data/initial_ngrams.msgpack', 'r') as f:
-    INITIAL_NGRAMS = msgpack.load(f, use_list=False)
-    for k in INITIAL_NGRAMS:
-        INITIAL_NGRAMS[k] = set(INITIAL_NGRAMS[k])
+def load_ngrams(fname):
+    with open(fname, 'r') as f:
+        ngrams = msgpack.load(f, use_list=False)
+    for k in ngrams:
+        ngrams[k] = set(ngrams[k])
+    return ngrams
+
+
+NGRAMS = register('ngrams', 'data/ngrams.msgpack', load_ngrams)
+
+
+class PrefixAutomaton(object):
+    """
+    A minimal automaton accepting every prefix of every dictionary word
+    of a single length. A partial word is checked one letter at a time
+    with step(), so extending it by a letter is a single dict lookup
+    rather than a fresh set lookup on a new string.
+    """
+    __slots__ = ['transitions']
+    START = 0
+
+    def __init__(self, transitions):
+        self.transitions = transitions
+
+    def step(self, state, c):
+        """
+        Return the state reached by reading c from state, or None if no
+        dictionary word continues that way.
+        """
+        return self.transitions.get((state << 8) | ord(c))
+
+    def accepts(self, prefix):
+        state = self.START
+        for c in prefix:
+            state = self.step(state, c)
+            if state is None:
+                return False
+        return True
+
+
+def load_prefix_automata(fname):
+    with open(fname, 'r') as f:
+        return dict((l, PrefixAutomaton(t)) for l, t in msgpack.load(f).items())
+
+
+PREFIX_AUTOMATA = register('prefix_automata', 'data/prefix_automata.msgpack', load_prefix_automata)
+
+
+def bigram_mask(bigrams):
+    """
+    Pack a set of bigrams into one bitmask row per first letter:
+    mask[ord(a)] >> ord(b) & 1 is set iff ab is in the set.
+    """
+    mask = [0] * 256
+    for b in bigrams:
+        mask[ord(b[0])] |= 1 << ord(b[1])
+    return mask
+
+
+def load_bigrams(fname):
+    with open(fname, 'r') as f:
+        return dict((l, bigram_mask(b)) for l, b in msgpack.load(f).items())
+
+
+BIGRAMS = register('bigrams', 'data/bigrams.msgpack', load_bigrams)
+
+_bigram_masks = dict()
+
+
+def bigram_masks(lengths):
+    """
+    The union of the bigram masks for all of the given word lengths.
+    """
+    lengths = tuple(lengths)
+    if lengths not in _bigram_masks:
+        mask = [0] * 256
+        for l in lengths:
+            if l in BIGRAMS:
+                mask = [a | b for a, b in zip(mask, BIGRAMS[l])]
+        _bigram_masks[lengths] = mask
+    return _bigram_masks[lengths]
@@ -0,0 +1,189 @@
+import collections
+import mmap
+import struct
+
+"""
+A read-only, memory-mapped string -> tuple-of-strings table.
+
+The file layout is:
+
+    header:         MAGIC, number of keys n
+    key offsets:    n + 1 uint32 offsets into the key blob
+    value offsets:  n + 1 uint32 offsets into the value blob
+    key blob:       all keys, concatenated in sorted order
+    value blob:     for each key, its values joined by SEPARATOR
+
+A length-indexed store (MAGIC_LENGTH_INDEXED) keeps each key's values
+sorted by length, and starts each value entry with a small index: the
+number of distinct lengths, then for each length the end offset of the
+values up to that length. This lets values_up_to() return only the
+values short enough to be used, without reading the rest.
+
+Keys are found by binary search directly over the mapped file, so
+opening a store costs nothing and every process which opens the same
+file shares its pages through the OS page cache.
+"""
+
+MAGIC = 'CRST'
+MAGIC_LENGTH_INDEXED = 'CRSL'
+SEPARATOR = '\n'
+HEADER_FORMAT = '<4sI'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+OFFSET_FORMAT = '<I'
+OFFSET_SIZE = struct.calcsize(OFFSET_FORMAT)
+COUNT_FORMAT = '<B'
+COUNT_SIZE = struct.calcsize(COUNT_FORMAT)
+LENGTH_FORMAT = '<HI'
+LENGTH_SIZE = struct.calcsize(LENGTH_FORMAT)
+
+
+def length_indexed_entry(values):
+    values = sorted(values, key=lambda v: (len(v), v))
+    index = []
+    end = -len(SEPARATOR)
+    for v in values:
+        end += len(v) + len(SEPARATOR)
+        if index and index[-1][0] == len(v):
+            index[-1] = (len(v), end)
+        else:
+            index.append((len(v), end))
+    return (struct.pack(COUNT_FORMAT, len(index)) +
+            ''.join(struct.pack(LENGTH_FORMAT, l, e) for l, e in index) +
+            SEPARATOR.join(values))
+
+
+def write_sorted_store(table, fname, length_index=False):
+    """
+    Write a dict of string -> list of strings to fname in the format
+    read by SortedStore, with each key's values indexed by length if
+    length_index is set.
+    """
+    keys = sorted(table.keys())
+    key_offsets = [0]
+    value_offsets = [0]
+    key_blob = []
+    value_blob = []
+    for k in keys:
+        if length_index:
+            v = length_indexed_entry(table[k])
+        else:
+            v = SEPARATOR.join(table[k])
+        key_blob.append(k)
+        value_blob.append(v)
+        key_offsets.append(key_offsets[-1] + len(k))
+        value_offsets.append(value_offsets[-1] + len(v))
+    with open(fname, 'wb') as f:
+        f.write(struct.pack(HEADER_FORMAT, MAGIC_LENGTH_INDEXED if length_index else MAGIC, len(keys)))
+        f.write(struct.pack('<%dI' % len(key_offsets), *key_offsets))
+        f.write(struct.pack('<%dI' % len(value_offsets), *value_offsets))
+        f.write(''.join(key_blob))
+        f.write(''.join(value_blob))
+
+
+class SortedStore(collections.Mapping):
+    """
+    Dict-like read-only view of a file written by write_sorted_store.
+    Lookups and membership tests are O(log n) and never deserialize
+    more than the entry being asked for. With lower=True, values are
+    lower-cased and interned the first time they are read, and that
+    tuple is kept and returned for every later read.
+    """
+    def __init__(self, fname, lower=False):
+        with open(fname, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._n = struct.unpack_from(HEADER_FORMAT, self._mm, 0)
+        if magic not in (MAGIC, MAGIC_LENGTH_INDEXED):
+            raise ValueError("Not a sorted store file: " + fname)
+        self.length_indexed = magic == MAGIC_LENGTH_INDEXED
+        self._key_offsets = HEADER_SIZE
+        self._value_offsets = self._key_offsets + (self._n + 1) * OFFSET_SIZE
+        self._keys = self._value_offsets + (self._n + 1) * OFFSET_SIZE
+        self._values = self._keys + self._offset(self._key_offsets, self._n)
+        self.lower = lower
+        # (start, end) of the values read -> their lower-cased tuple
+        self._lowered = dict()
+
+    def _offset(self, table, i):
+        return struct.unpack_from(OFFSET_FORMAT, self._mm, table + i * OFFSET_SIZE)[0]
+
+    def _key(self, i):
+        return self._mm[self._keys + self._offset(self._key_offsets, i):
+                        self._keys + self._offset(self._key_offsets, i + 1)]
+
+    def _entry(self, i):
+        """
+        The start and end of the i'th key's values in the file, and the
+        start of its length index, if the store has one.
+        """
+        start = self._values + self._offset(self._value_offsets, i)
+        end = self._values + self._offset(self._value_offsets, i + 1)
+        if not self.length_indexed:
+            return start, end, None
+        count = struct.unpack_from(COUNT_FORMAT, self._mm, start)[0]
+        return start + COUNT_SIZE + count * LENGTH_SIZE, end, start
+
+    def _read(self, start, end):
+        if not self.lower:
+            return tuple(self._mm[start:end].split(SEPARATOR))
+        values = self._lowered.get((start, end))
+        if values is None:
+            values = tuple(intern(v.lower()) for v in self._mm[start:end].split(SEPARATOR))
+            self._lowered[(start, end)] = values
+        return values
+
+    def _value(self, i):
+        start, end, index = self._entry(i)
+        if start == end:
+            return ()
+        return self._read(start, end)
+
+    def values_up_to(self, key, length):
+        """
+        The values for key no longer than length, or () if there are none
+        or key is missing. Only reads the values needed if the store is
+        length-indexed.
+        """
+        i = self._find(key) if isinstance(key, basestring) else None
+        if i is None:
+            return ()
+        if not self.length_indexed:
+            return tuple(v for v in self._value(i) if len(v) <= length)
+        start, end, index = self._entry(i)
+        count = struct.unpack_from(COUNT_FORMAT, self._mm, index)[0]
+        cutoff = None
+        for j in range(count):
+            l, e = struct.unpack_from(LENGTH_FORMAT, self._mm, index + COUNT_SIZE + j * LENGTH_SIZE)
+            if l > length:
+                break
+            cutoff = e
+        if cutoff is None:
+            return ()
+        return self._read(start, start + cutoff)
+
+    def _find(self, key):
+        lo, hi = 0, self._n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._n and self._key(lo) == key:
+            return lo
+        return None
+
+    def __contains__(self, key):
+        return isinstance(key, basestring) and self._find(key) is not None
+
+    def __getitem__(self, key):
+        i = self._find(key) if isinstance(key, basestring) else None
+        if i is None:
+            raise KeyError(key)
+        return self._value(i)
+
+    def __iter__(self):
+        for i in xrange(self._n):
+            yield self._key(i)
+
+    def __len__(self):
+        return self._n
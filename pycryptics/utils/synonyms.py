@@ -1,7 +1,12 @@
-import msgpack
+from pycryptics.utils.sorted_store import SortedStore
+from pycryptics.utils.data_files import register
 
-with open('data/synonyms.msgpack', 'r') as f:
-    SYNONYMS = msgpack.load(f, use_list=False)
+
+def load_synonyms(fname):
+    return SortedStore(fname, lower=True)
+
+
+SYNONYMS = register('synonyms', 'data/synonyms.dat', load_synonyms)
 
 
 def cached_synonyms(x, length=None):
@@ -11,3 +16,12 @@ def cached_synonyms(x, length=None):
         return set(syns)
     else:
         return set([])
+
+
+def synonyms_up_to(x, length):
+    """
+    The synonyms of x no longer than length, read straight from the
+    length index of the synonym store, which lower-cases and interns
+    them once, so the functions in clue_funcs need not do it again.
+    """
+    return SYNONYMS.values_up_to(x.lower(), length)
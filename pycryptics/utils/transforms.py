@@ -1,5 +1,5 @@
-from pycryptics.utils.synonyms import cached_synonyms, SYNONYMS
-from pycryptics.utils.ngrams import INITIAL_NGRAMS
+from pycryptics.utils.synonyms import SYNONYMS
+from pycryptics.utils.ngrams import PREFIX_AUTOMATA, PrefixAutomaton
 
 def split_words(ans, lengths):
     j = 0
@@ -34,10 +34,44 @@ def valid_answer(ans, constraints):
 def valid_partial_answer(ans, constraints):
     if len(ans) > sum(constraints.lengths):
         return False
-    if not matches_pattern(ans, constraints.pattern):
-        return False
-    words = split_words(ans, constraints.lengths)
-    for i, word in enumerate(words):
-        if word not in INITIAL_NGRAMS[constraints.lengths[i]]:
-            return False
-    return True
+    return extend_partial_answer(start_partial_answer(constraints), ans, constraints) is not None
+
+
+def start_partial_answer(constraints):
+    """
+    The state of an empty partial answer, as a tuple of
+    (letters so far, index of the current word, letters left in the
+    current word, prefix automaton state within the current word).
+    """
+    return (0, 0, constraints.lengths[0], PrefixAutomaton.START)
+
+
+def extend_partial_answer(state, letters, constraints):
+    """
+    Extend a partial answer state by some letters, checking only the new
+    letters against the pattern and the dictionary prefixes of each word.
+    Returns the new state, or None if no valid answer starts this way.
+    """
+    pos, word, remaining, node = state
+    lengths = constraints.lengths
+    pattern = constraints.pattern
+    automata = PREFIX_AUTOMATA.value()
+    for c in letters:
+        if word >= len(lengths):
+            return None
+        if pattern != "" and pattern[pos] != '.' and pattern[pos] != c:
+            return None
+        automaton = automata.get(lengths[word])
+        if automaton is None:
+            return None
+        node = automaton.step(node, c)
+        if node is None:
+            return None
+        pos += 1
+        remaining -= 1
+        if remaining == 0:
+            word += 1
+            if word < len(lengths):
+                remaining = lengths[word]
+            node = PrefixAutomaton.START
+    return (pos, word, remaining, node)